@@ -1,9 +1,36 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
 import os
 import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from confidence_profile import StageProfiler
+from confidence_analysis import (CI_COLUMNS, REJECTION_COLUMN, InvalidScoresError, analyze_frame, summarize_counts,
+                                 validate_scores, categorize_confidence as categorize_one)
+from confidence_bootstrap import DEFAULT_LEVEL, DEFAULT_RESAMPLES, DEFAULT_SEED
+from confidence_cache import ResultCache, restore_files
+from confidence_state import complete_lines_end, input_fingerprint, load_state, save_state
+from confidence_engine import (CATEGORIES, DENSITY_BINS, HIGH_SCORE_CUTOFF, STRONG_MISCALIBRATION_CUTOFF,
+                               category_histograms, parameter_grid_counts)
+from confidence_plots import RENDER_MODES
+from confidence_io import (FORMATS, REQUIRED_COLUMNS, TableWriter, column_dtypes, detect_format,
+                           iter_table_chunks, output_path, read_columns, read_table, with_text_score_fallback,
+                           write_table)
+# The chart code (confidence_figures) is imported only when charts are drawn,
+# so runs with plots=False (--no-plots) never load matplotlib at all.
+
+DEFAULT_CHUNKSIZE = 100000
+
+# What to do with rows whose scores are missing, not numbers or outside 0-100:
+# leave them out and save them to a rejects file, stop with an error, or
+# analyze them anyway (a missing score makes a row moderately underconfident)
+INVALID_ACTIONS = ('reject', 'fail', 'keep')
+
+# Worker processes that render the charts while the tables are written. On a
+# single-core machine they would only compete with the analysis, so the
+# charts are rendered in-process there.
+DEFAULT_RENDER_WORKERS = min(2, (os.cpu_count() or 1) - 1)
 
 def categorize_confidence(row, calibration_threshold=5):
     """
@@ -16,144 +43,1213 @@ def categorize_confidence(row, calibration_threshold=5):
     Returns:
         A string indicating the confidence category
     """
-    quiz_score = row['Quiz Score']
-    confidence = row['Confidence Score']
+    return categorize_one(row['Quiz Score'], row['Confidence Score'], calibration_threshold)
+
+def _prepare_output_dir(file_path, output_dir):
+    """Return the output directory (default: the input file's directory), creating it if it doesn't exist."""
+    if output_dir is None:
+        output_dir = os.path.dirname(file_path)
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
+
+def _check_columns(columns, required=REQUIRED_COLUMNS):
+    """
+    Check that an input file has the columns an analysis needs.
     
-    diff = confidence - quiz_score
+    Prints an error naming the first missing column.
     
-    if abs(diff) <= calibration_threshold:
-        if quiz_score >= 70:  # Assuming 70% is a "high" score
-            return "Calibrated - Knows They Know"
-        else:
-            return "Calibrated - Knows They Don't Know"
-    elif diff > calibration_threshold:
-        if diff > 20:
-            return "Highly Overconfident"
-        else:
-            return "Moderately Overconfident"
-    else:  # diff < -calibration_threshold
-        if diff < -20:
-            return "Highly Underconfident"
-        else:
-            return "Moderately Underconfident"
+    Returns:
+        True if every required column is present
+    """
+    for col in required:
+        if col not in columns:
+            print(f"Error: Missing required column '{col}' in the input file.")
+            return False
+    return True
 
-def analyze_confidence_data(file_path, output_dir=None, calibration_threshold=5):
+def analyze_confidence_data(file_path, output_dir=None, calibration_threshold=5, chunksize=None, workers=1,
+                            render_mode='auto', output_format=None, plots=True, profile=False, cprofile_stage=None,
+                            trace_memory=False, render_workers=DEFAULT_RENDER_WORKERS, use_cache=True, cache_dir=None,
+                            incremental=False, on_invalid='reject', bootstrap=0, ci_level=DEFAULT_LEVEL,
+                            seed=DEFAULT_SEED, history=None):
     """
     Analyze quiz score vs. confidence data.
     
     Args:
-        file_path: Path to the CSV file containing the data
+        file_path: Path to the CSV, Parquet or Feather file containing the data
         output_dir: Directory to save the output files (default: same as input file)
         calibration_threshold: The threshold to determine if confidence is calibrated
+        chunksize: If set, stream the file in chunks of this many rows instead
+            of loading it all at once (see analyze_confidence_data_streaming)
+        workers: If more than 1, split the file across this many worker processes
+            (implies streaming mode)
+        render_mode: How to draw users in the scatter plot: 'scatter', 'density',
+            or 'auto' to switch to a density grid for large files
+        output_format: Format of the results and summary tables: 'csv', 'parquet'
+            or 'feather' (default: same as the input file)
+        plots: If False, only write the tables and skip the charts
+        profile: If True, write a JSON report with the wall time, CPU time and
+            peak memory of each stage next to the outputs
+        cprofile_stage: Name of a stage to also run under cProfile (implies profile)
+        trace_memory: Also measure the peak allocations of each stage with
+            tracemalloc (implies profile; slows down the CSV write)
+        render_workers: Number of processes that render the charts in the
+            background (0 renders them in this process)
+        use_cache: Reuse the outputs of an earlier run on the same file content
+            with the same parameters (see confidence_cache); profiled runs never do
+        cache_dir: Cache directory (default: CONFIDENCE_CACHE_DIR or ~/.cache/confidence_analyzer)
+        incremental: Only process the rows appended to a CSV file since the last
+            incremental run (see analyze_confidence_data_incremental)
+        on_invalid: What to do with rows whose scores are missing, not numbers
+            or outside 0-100: 'reject' leaves them out and saves them to
+            confidence_analysis_rejects_<timestamp>, 'fail' stops with an
+            error, 'keep' analyzes them anyway
+        bootstrap: If set, add confidence intervals of the percentages from
+            this many bootstrap resamples to the summary, drawn as error bars
+            on the distribution chart
+        ci_level: Confidence level of the intervals
+        seed: Seed of the bootstrap draws; the same seed gives the same intervals
+        history: Path of a run history database (see confidence_history) to
+            add the labeled rows and counts of this run to; recorded runs
+            never reuse cached results
         
     Returns:
-        DataFrame with the analysis results
+        DataFrame with the analysis results (the summary table in streaming
+        and incremental mode)
     """
-    # Determine output directory
-    if output_dir is None:
-        output_dir = os.path.dirname(file_path)
+    if incremental:
+        if workers > 1 or output_format not in (None, 'csv'):
+            print("Note: incremental mode reads the file in one process and writes CSV tables.")
+        return analyze_confidence_data_incremental(file_path, output_dir, calibration_threshold,
+                                                   chunksize or DEFAULT_CHUNKSIZE, plots, profile, cprofile_stage,
+                                                   trace_memory, render_workers, on_invalid, bootstrap, ci_level,
+                                                   seed, history)
     
-    # Create output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
+    if chunksize or workers > 1:
+        return analyze_confidence_data_streaming(file_path, output_dir, calibration_threshold,
+                                                 chunksize or DEFAULT_CHUNKSIZE, workers, output_format, plots,
+                                                 profile, cprofile_stage, trace_memory, render_workers, use_cache,
+                                                 cache_dir, on_invalid, bootstrap, ci_level, seed, history)
+    
+    profiler = StageProfiler(profile or cprofile_stage is not None or trace_memory, cprofile_stage, trace_memory)
+    
+    output_dir = _prepare_output_dir(file_path, output_dir)
+    
+    cache, cache_key, cached = check_cache(file_path, output_dir, use_cache and not (profiler.enabled or history),
+                                            cache_dir, calibration_threshold=calibration_threshold, plots=plots,
+                                            render_mode=render_mode if plots else None,
+                                            output_format=output_format or detect_format(file_path),
+                                            on_invalid=on_invalid,
+                                            bootstrap=[bootstrap, ci_level, seed] if bootstrap else None)
+    if cached is not None:
+        return cached
+    
+    # Create a timestamp for the output files
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    fmt = output_format or detect_format(file_path)
     
     # Read the data
     try:
-        df = pd.read_csv(file_path)
-        required_columns = ['User Name', 'Quiz Score', 'Confidence Score']
-        for col in required_columns:
-            if col not in df.columns:
-                print(f"Error: Missing required column '{col}' in the CSV file.")
+        with profiler.stage('read'):
+            columns = read_columns(file_path)
+            if not _check_columns(columns):
                 return None
+            df = read_scores_table(file_path)
     except Exception as e:
-        print(f"Error reading the CSV file: {e}")
+        print(f"Error reading the input file: {e}")
         return None
     
+    # Check every score before anything is labeled
+    rejects_file = output_path(output_dir, f"confidence_analysis_rejects_{timestamp}", fmt)
+    try:
+        with profiler.stage('validate'), Rejects(rejects_file, fmt, on_invalid) as rejects:
+            df = rejects.check(df)
+    except InvalidScoresError as e:
+        print(f"Error: {e}")
+        return None
+    rejects.report()
+    
     # Add confidence category column
-    df['Confidence Category'] = df.apply(categorize_confidence, axis=1, calibration_threshold=calibration_threshold)
+    with profiler.stage('categorize'):
+        analysis = analyze_frame(df, calibration_threshold)
+        df['Confidence Category'] = analysis.labels
     
     # Calculate summary statistics
-    summary = df['Confidence Category'].value_counts().reset_index()
-    summary.columns = ['Category', 'Count']
-    summary['Percentage'] = (summary['Count'] / len(df) * 100).round(1)
+    with profiler.stage('summary'):
+        summary = analysis.summary(bootstrap, ci_level, seed)
     
-    # Create a timestamp for the output files
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Start the charts first, so they render in the background while the tables are written
+    renderer = None
+    if plots:
+        from confidence_figures import scatter_data
+        with profiler.stage('render_submit'):
+            renderer = start_plots(summary, output_dir, timestamp, calibration_threshold, render_workers,
+                                   **scatter_data(df['Quiz Score'].values, df['Confidence Score'].values,
+                                                  analysis.codes, render_mode))
     
     # Save detailed results
-    output_file = os.path.join(output_dir, f"confidence_analysis_results_{timestamp}.csv")
-    df.to_csv(output_file, index=False)
+    output_file = output_path(output_dir, f"confidence_analysis_results_{timestamp}", fmt)
+    with profiler.stage('write_results'):
+        write_table(df, output_file, fmt)
     
     # Save summary results
-    summary_file = os.path.join(output_dir, f"confidence_analysis_summary_{timestamp}.csv")
-    summary.to_csv(summary_file, index=False)
-    
-    # Create visualizations
-    create_visualizations(df, output_dir, timestamp)
+    summary_file = output_path(output_dir, f"confidence_analysis_summary_{timestamp}", fmt)
+    with profiler.stage('write_summary'):
+        write_table(summary, summary_file, fmt)
     
     print(f"Analysis complete. Results saved to {output_dir}")
     print("\nSummary of Confidence Categories:")
     print(summary.to_string(index=False))
+    print_ci_note(bootstrap, ci_level, seed)
+    
+    charts_saved = False
+    if renderer is not None:
+        with profiler.stage('render_wait'):
+            charts_saved = finish_plots(renderer)
+    
+    if history:
+        with profiler.stage('history'):
+            record_history(history, file_path, calibration_threshold, output_file, df)
+    
+    report_file = profiler.write(output_dir, timestamp, input_file=file_path, rows=len(df),
+                                 calibration_threshold=calibration_threshold, mode='in-memory')
+    if report_file:
+        print(f"Profile report saved to {report_file}")
+    
+    if cache is not None and (renderer is None or charts_saved):
+        store_in_cache(cache, cache_key, output_file, summary_file, output_dir, timestamp, plots, rejects.file_path)
     
     return df
 
-def create_visualizations(df, output_dir, timestamp):
+def analyze_confidence_data_streaming(file_path, output_dir=None, calibration_threshold=5, chunksize=DEFAULT_CHUNKSIZE,
+                                      workers=1, output_format=None, plots=True, profile=False, cprofile_stage=None,
+                                      trace_memory=False, render_workers=DEFAULT_RENDER_WORKERS, use_cache=True,
+                                      cache_dir=None, on_invalid='reject', bootstrap=0, ci_level=DEFAULT_LEVEL,
+                                      seed=DEFAULT_SEED, history=None):
+    """
+    Analyze quiz score vs. confidence data with bounded memory.
+    
+    The input is read in chunks of `chunksize` rows. Each chunk is labeled,
+    appended to the results file and added to the running category counts,
+    so only one chunk is held in memory at a time. The scatter plot is
+    drawn as a density grid accumulated chunk by chunk.
+    
+    With more than one worker a CSV file is split into line-aligned byte
+    ranges that are parsed and labeled in separate processes, and the
+    per-shard results and counts are merged afterwards.
+    
+    Args:
+        file_path: Path to the CSV, Parquet or Feather file containing the data
+        output_dir: Directory to save the output files (default: same as input file)
+        calibration_threshold: The threshold to determine if confidence is calibrated
+        chunksize: Number of rows to read per chunk
+        workers: Number of worker processes to split a CSV file across
+        output_format: Format of the results and summary tables (default: same as the input file)
+        plots: If False, only write the tables and skip the charts
+        profile: If True, write a JSON report with the wall time, CPU time and
+            peak memory of each stage next to the outputs
+        cprofile_stage: Name of a stage to also run under cProfile (implies profile)
+        trace_memory: Also measure the peak allocations of each stage with
+            tracemalloc (implies profile; slows down the CSV write)
+        render_workers: Number of processes that render the charts in the
+            background (0 renders them in this process)
+        use_cache: Reuse the outputs of an earlier run on the same file content
+            with the same parameters (see confidence_cache); profiled runs never do
+        cache_dir: Cache directory (default: CONFIDENCE_CACHE_DIR or ~/.cache/confidence_analyzer)
+        on_invalid: What to do with rows with invalid scores (see INVALID_ACTIONS)
+        bootstrap, ci_level, seed: Bootstrap confidence intervals (see analyze_confidence_data)
+        history: Run history database to record the run in (see analyze_confidence_data)
+        
+    Returns:
+        DataFrame with the summary of the analysis
+    """
+    profiler = StageProfiler(profile or cprofile_stage is not None or trace_memory, cprofile_stage, trace_memory)
+    
+    output_dir = _prepare_output_dir(file_path, output_dir)
+    
+    # The labels and counts don't depend on the chunking, but the scatter
+    # plot of a streamed run is always a density grid
+    cache, cache_key, cached = check_cache(file_path, output_dir, use_cache and not (profiler.enabled or history),
+                                            cache_dir, streaming=True, calibration_threshold=calibration_threshold,
+                                            plots=plots, render_mode='density' if plots else None,
+                                            output_format=output_format or detect_format(file_path),
+                                            on_invalid=on_invalid,
+                                            bootstrap=[bootstrap, ci_level, seed] if bootstrap else None)
+    if cached is not None:
+        return cached
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    input_format = detect_format(file_path)
+    fmt = output_format or input_format
+    output_file = output_path(output_dir, f"confidence_analysis_results_{timestamp}", fmt)
+    rejects_file = output_path(output_dir, f"confidence_analysis_rejects_{timestamp}", fmt)
+    
+    if workers > 1 and input_format != 'csv':
+        print("Note: --workers only applies to CSV input; reading the file in one process.")
+        workers = 1
+    
+    try:
+        # Check the header before anything is written
+        columns = read_columns(file_path)
+        if not _check_columns(columns):
+            return None
+        
+        # Reading, labeling and writing are interleaved chunk by chunk, so they are one stage
+        with profiler.stage('label'):
+            if workers > 1:
+                category_counts, histograms, rejected = _label_sharded(file_path, output_file, fmt, columns,
+                                                                       calibration_threshold, chunksize, workers,
+                                                                       on_invalid, rejects_file)
+            else:
+                chunks = with_text_score_fallback(
+                    lambda text_scores: iter_table_chunks(file_path, chunksize, text_scores=text_scores))
+                with TableWriter(output_file, fmt) as out, Rejects(rejects_file, fmt, on_invalid) as rejects:
+                    category_counts, histograms = _label_chunks(chunks, out, calibration_threshold, rejects)
+                rejected = rejects.count
+    except InvalidScoresError as e:
+        print(f"Error: {e}")
+        for path in (output_file, rejects_file):
+            if os.path.exists(path):
+                os.remove(path)
+        return None
+    except Exception as e:
+        print(f"Error reading the input file: {e}")
+        return None
+    Rejects.report_count(rejected, on_invalid, rejects_file)
+    
+    # Save summary results
+    with profiler.stage('summary'):
+        summary = summarize_counts(category_counts, bootstrap, ci_level, seed)
+    
+    # The rows are gone, so the scatter plot is drawn from the density grid
+    renderer = None
+    if plots:
+        with profiler.stage('render_submit'):
+            renderer = start_plots(summary, output_dir, timestamp, calibration_threshold, render_workers,
+                                   histograms=histograms)
+    
+    summary_file = output_path(output_dir, f"confidence_analysis_summary_{timestamp}", fmt)
+    with profiler.stage('write_summary'):
+        write_table(summary, summary_file, fmt)
+    
+    print(f"Analysis complete. Results saved to {output_dir}")
+    print("\nSummary of Confidence Categories:")
+    print(summary.to_string(index=False))
+    print_ci_note(bootstrap, ci_level, seed)
+    
+    charts_saved = False
+    if renderer is not None:
+        with profiler.stage('render_wait'):
+            charts_saved = finish_plots(renderer)
+    
+    if history:
+        with profiler.stage('history'):
+            record_history(history, file_path, calibration_threshold, output_file)
+    
+    report_file = profiler.write(output_dir, timestamp, input_file=file_path, rows=int(category_counts.sum()),
+                                 calibration_threshold=calibration_threshold, mode='streaming',
+                                 chunksize=chunksize, workers=workers)
+    if report_file:
+        print(f"Profile report saved to {report_file}")
+    
+    if cache is not None and (renderer is None or charts_saved):
+        store_in_cache(cache, cache_key, output_file, summary_file, output_dir, timestamp, plots, rejects_file)
+    
+    return summary
+
+def analyze_confidence_data_incremental(file_path, output_dir=None, calibration_threshold=5,
+                                        chunksize=DEFAULT_CHUNKSIZE, plots=True, profile=False, cprofile_stage=None,
+                                        trace_memory=False, render_workers=DEFAULT_RENDER_WORKERS, on_invalid='reject',
+                                        bootstrap=0, ci_level=DEFAULT_LEVEL, seed=DEFAULT_SEED, history=None):
+    """
+    Analyze a CSV file that grows by appended rows, processing only the new rows.
+    
+    The outputs have fixed names based on the input file name
+    (confidence_analysis_results_<name>.csv and so on). Next to them a
+    state file records how far into the input the last run got, the
+    running category counts and density grid, and a fingerprint of the
+    part already processed. A run reads from that offset on, appends the
+    labels of the new rows to the results file and rewrites the summary
+    and charts from the updated counts.
+    
+    If there is no state yet, or the input was truncated or rewritten, the
+    threshold or columns changed, or the results file no longer matches
+    the state, the whole file is processed again from the start. A last
+    line without a line break is treated as still being written and is
+    left for the next run.
+    
+    Args:
+        file_path: Path to the CSV file containing the data
+        output_dir: Directory to save the output files (default: same as input file)
+        calibration_threshold: The threshold to determine if confidence is calibrated
+        chunksize: Number of rows to read per chunk
+        plots: If False, only write the tables and skip the charts
+        profile: If True, write a JSON report with the wall time, CPU time and
+            peak memory of each stage next to the outputs
+        cprofile_stage: Name of a stage to also run under cProfile (implies profile)
+        trace_memory: Also measure the peak allocations of each stage with
+            tracemalloc (implies profile)
+        render_workers: Number of processes that render the charts in the
+            background (0 renders them in this process)
+        on_invalid: What to do with rows with invalid scores (see INVALID_ACTIONS);
+            rejected rows are appended to confidence_analysis_rejects_<name>.csv
+        bootstrap, ci_level, seed: Bootstrap confidence intervals (see analyze_confidence_data)
+        history: Run history database to record the run in (see analyze_confidence_data)
+        
+    Returns:
+        DataFrame with the summary of the analysis
+    """
+    profiler = StageProfiler(profile or cprofile_stage is not None or trace_memory, cprofile_stage, trace_memory)
+    
+    if detect_format(file_path) != 'csv':
+        print("Error: Incremental mode requires a CSV input file.")
+        return None
+    
+    output_dir = _prepare_output_dir(file_path, output_dir)
+    
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    output_file = output_path(output_dir, f"confidence_analysis_results_{stem}")
+    summary_file = output_path(output_dir, f"confidence_analysis_summary_{stem}")
+    rejects_file = output_path(output_dir, f"confidence_analysis_rejects_{stem}")
+    
+    try:
+        # Check the header before anything is written
+        columns = read_columns(file_path)
+        if not _check_columns(columns):
+            return None
+        
+        with profiler.stage('resume'):
+            saved = load_state(output_dir, stem)
+            reason = _resume_mismatch(saved, file_path, output_file, columns, calibration_threshold, on_invalid)
+            if reason is None:
+                state, category_counts, histograms = saved
+                start = state['offset']
+            else:
+                if saved is not None:
+                    print(f"Note: {reason}; analyzing the whole file again.")
+                with open(file_path, 'rb') as f:
+                    f.readline()
+                    start = f.tell()
+                category_counts = np.zeros(len(CATEGORIES), dtype=np.int64)
+                histograms = np.zeros((len(CATEGORIES), DENSITY_BINS, DENSITY_BINS), dtype=np.int64)
+            end = complete_lines_end(file_path, start)
+        
+        # Reading, labeling and appending are interleaved chunk by chunk, so they are one stage
+        with profiler.stage('label'):
+            with TableWriter(output_file, 'csv', append=reason is None) as out, \
+                    Rejects(rejects_file, 'csv', on_invalid, append=reason is None) as rejects:
+                if reason is not None:
+                    out.write(pd.DataFrame(columns=columns + ['Confidence Category']))
+                new_counts = np.zeros(len(CATEGORIES), dtype=np.int64)
+                if end > start:
+                    chunks = with_text_score_fallback(
+                        lambda text_scores: _range_chunks(file_path, start, end, columns, chunksize, text_scores))
+                    new_counts, new_histograms = _label_chunks(chunks, out, calibration_threshold, rejects)
+                    histograms = histograms + new_histograms
+            category_counts = category_counts + new_counts
+    except InvalidScoresError as e:
+        # Nothing is recorded, so the next run starts over from the last saved state
+        print(f"Error: {e}")
+        if saved is not None and reason is None:
+            os.truncate(output_file, saved[0]['results_size'])
+        else:
+            for path in (output_file, rejects_file):
+                if os.path.exists(path):
+                    os.remove(path)
+        return None
+    except Exception as e:
+        print(f"Error reading the input file: {e}")
+        return None
+    
+    rejects.report()
+    
+    with profiler.stage('summary'):
+        summary = summarize_counts(category_counts, bootstrap, ci_level, seed)
+    
+    renderer = None
+    if plots:
+        with profiler.stage('render_submit'):
+            renderer = start_plots(summary, output_dir, stem, calibration_threshold, render_workers,
+                                   histograms=histograms)
+    
+    with profiler.stage('write_summary'):
+        write_table(summary, summary_file, 'csv')
+    
+    # Saved last, so an interrupted run is repeated rather than counted twice
+    save_state(output_dir, stem, {
+        'input_file': os.path.abspath(file_path),
+        'columns': columns,
+        'calibration_threshold': calibration_threshold,
+        'on_invalid': on_invalid,
+        'rows': int(category_counts.sum()),
+        'results_size': os.path.getsize(output_file),
+        'fingerprint': input_fingerprint(file_path, end),
+        'offset': end,
+    }, category_counts, histograms)
+    
+    print(f"Analysis complete ({int(new_counts.sum())} new rows, {int(category_counts.sum())} in total). "
+          f"Results saved to {output_dir}")
+    print("\nSummary of Confidence Categories:")
+    print(summary.to_string(index=False))
+    print_ci_note(bootstrap, ci_level, seed)
+    
+    if renderer is not None:
+        with profiler.stage('render_wait'):
+            finish_plots(renderer)
+    
+    if history:
+        with profiler.stage('history'):
+            record_history(history, file_path, calibration_threshold, output_file)
+    
+    report_file = profiler.write(output_dir, datetime.now().strftime("%Y%m%d_%H%M%S"), input_file=file_path,
+                                 rows=int(new_counts.sum()), calibration_threshold=calibration_threshold,
+                                 mode='incremental' if reason is None else 'incremental_full', chunksize=chunksize)
+    if report_file:
+        print(f"Profile report saved to {report_file}")
+    
+    return summary
+
+def _resume_mismatch(saved, file_path, output_file, columns, calibration_threshold, on_invalid):
+    """
+    Check whether an incremental run can continue from its saved state.
+    
+    Returns:
+        None if it can, otherwise the reason it has to start over
+    """
+    if saved is None:
+        return "no saved state"
+    state = saved[0]
+    if state['calibration_threshold'] != calibration_threshold:
+        return "the calibration threshold changed"
+    if state.get('on_invalid') != on_invalid:
+        return "the handling of invalid scores changed"
+    if state['columns'] != columns:
+        return "the input columns changed"
+    if os.path.getsize(file_path) < state['offset']:
+        return "the input file was truncated"
+    if input_fingerprint(file_path, state['offset']) != state['fingerprint']:
+        return "the input file was rewritten"
+    if not os.path.exists(output_file) or os.path.getsize(output_file) != state['results_size']:
+        return "the results file was changed or removed"
+    return None
+
+def analyze_confidence_grid(file_path, output_dir=None, calibration_thresholds=(5,),
+                            high_score_cutoffs=(HIGH_SCORE_CUTOFF,), strong_cutoffs=(STRONG_MISCALIBRATION_CUTOFF,),
+                            chunksize=None, output_format=None, on_invalid='reject'):
+    """
+    Count the confidence categories for every combination of the three cutoffs.
+    
+    All combinations are counted in one pass over the scores (see
+    confidence_engine.parameter_grid_counts) and written as a tidy table
+    with one row per combination and category.
+    
+    Args:
+        file_path: Path to the CSV, Parquet or Feather file containing the data
+        output_dir: Directory to save the output file (default: same as input file)
+        calibration_thresholds: Calibration thresholds to try
+        high_score_cutoffs: Quiz scores from which calibrated users "know they know"
+        strong_cutoffs: Differences beyond which miscalibration is "highly" rather than "moderately"
+        chunksize: If set, read the file in chunks of this many rows and add up their counts
+        output_format: Format of the grid table (default: same as the input file)
+        on_invalid: What to do with rows with invalid scores (see INVALID_ACTIONS)
+        
+    Returns:
+        DataFrame with 'Calibration Threshold', 'High Score Cutoff', 'Strong Cutoff',
+        'Category', 'Count' and 'Percentage' columns
+    """
+    output_dir = _prepare_output_dir(file_path, output_dir)
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    fmt = output_format or detect_format(file_path)
+    rejects_file = output_path(output_dir, f"confidence_analysis_rejects_{timestamp}", fmt)
+    score_columns = ['Quiz Score', 'Confidence Score']
+    try:
+        columns = read_columns(file_path)
+        if not _check_columns(columns):
+            return None
+        
+        counts = 0
+        with Rejects(rejects_file, fmt, on_invalid) as rejects:
+            for chunk in _score_chunks(file_path, chunksize, score_columns):
+                chunk = rejects.check(chunk)
+                counts = counts + parameter_grid_counts(chunk['Quiz Score'].values, chunk['Confidence Score'].values,
+                                                        calibration_thresholds, high_score_cutoffs, strong_cutoffs)
+    except InvalidScoresError as e:
+        print(f"Error: {e}")
+        return None
+    except Exception as e:
+        print(f"Error reading the input file: {e}")
+        return None
+    rejects.report()
+    
+    grid = grid_table(counts, calibration_thresholds, high_score_cutoffs, strong_cutoffs)
+    grid_file = output_path(output_dir, f"confidence_grid_{timestamp}", fmt)
+    write_table(grid, grid_file, fmt)
+    
+    combinations = len(calibration_thresholds) * len(high_score_cutoffs) * len(strong_cutoffs)
+    print(f"Grid analysis complete: {combinations} combinations. Results saved to {grid_file}")
+    return grid
+
+def grid_table(counts, calibration_thresholds, high_score_cutoffs, strong_cutoffs):
+    """
+    Flatten parameter_grid_counts output into a tidy table.
+    
+    Returns:
+        DataFrame with one row per (threshold, high-score cutoff, strong cutoff, category)
+    """
+    t, h, s, c = np.meshgrid(np.arange(len(calibration_thresholds)), np.arange(len(high_score_cutoffs)),
+                             np.arange(len(strong_cutoffs)), np.arange(len(CATEGORIES)), indexing='ij')
+    counts = np.asarray(counts)
+    totals = counts.sum(axis=-1, keepdims=True)
+    percentages = np.round(counts / np.maximum(totals, 1) * 100, 1)
+    return pd.DataFrame({
+        'Calibration Threshold': np.asarray(calibration_thresholds)[t.ravel()],
+        'High Score Cutoff': np.asarray(high_score_cutoffs)[h.ravel()],
+        'Strong Cutoff': np.asarray(strong_cutoffs)[s.ravel()],
+        'Category': pd.Categorical.from_codes(c.ravel(), categories=CATEGORIES),
+        'Count': counts.ravel(),
+        'Percentage': percentages.ravel(),
+    })
+
+def parse_grid_values(spec):
+    """
+    Parse a list of grid values: comma-separated values and/or START:STOP[:STEP] ranges
+    (STOP included, STEP 1 by default).
+    
+    Returns:
+        List of numbers, ints where every value is whole
+    """
+    values = []
+    for part in spec.split(','):
+        if ':' in part:
+            bounds = [float(x) for x in part.split(':')]
+            start, stop, step = bounds if len(bounds) == 3 else bounds + [1.0]
+            if step <= 0:
+                raise argparse.ArgumentTypeError(f"Range step must be positive: {part}")
+            count = int(np.floor((stop - start) / step + 1e-9)) + 1
+            values.extend(np.round(start + step * np.arange(count), 10).tolist())
+        else:
+            values.append(float(part))
+    if all(float(v).is_integer() for v in values):
+        values = [int(v) for v in values]
+    return values
+
+def analyze_confidence_groups(file_path, group_by, output_dir=None, calibration_threshold=5, chunksize=None,
+                              output_format=None, plots=False, render_workers=DEFAULT_RENDER_WORKERS,
+                              on_invalid='reject'):
+    """
+    Count the confidence categories of every group (class, quiz, term, ...) in one pass.
+    
+    Each row's group is numbered with one groupby over the group columns,
+    and the counts of all groups come from a single bincount over
+    (group, category) pairs. With a chunksize the per-chunk counts are
+    added up per group, so the file is still scanned only once.
+    
+    Args:
+        file_path: Path to the CSV, Parquet or Feather file containing the data
+        group_by: Column names to group by
+        output_dir: Directory to save the output files (default: same as input file)
+        calibration_threshold: The threshold to determine if confidence is calibrated
+        chunksize: If set, read the file in chunks of this many rows
+        output_format: Format of the summary table (default: same as the input file)
+        plots: Also draw a distribution bar chart per group
+        render_workers: Number of processes that render the group charts
+            (0 renders them in this process)
+        on_invalid: What to do with rows with invalid scores (see INVALID_ACTIONS)
+        
+    Returns:
+        DataFrame with the group columns and 'Category', 'Count' and
+        'Percentage' (of the group) columns, one row per group and category
+    """
+    output_dir = _prepare_output_dir(file_path, output_dir)
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    fmt = output_format or detect_format(file_path)
+    rejects_file = output_path(output_dir, f"confidence_analysis_rejects_{timestamp}", fmt)
+    try:
+        columns = read_columns(file_path)
+        if not _check_columns(columns, REQUIRED_COLUMNS + [col for col in group_by if col not in REQUIRED_COLUMNS]):
+            return None
+        
+        needed = [col for col in columns if col in group_by or col in ('Quiz Score', 'Confidence Score')]
+        # Group keys are read as text, so a key like 101 has the same type in every chunk
+        keys = [col for col in group_by if col not in REQUIRED_COLUMNS]
+        group_counts = []
+        with Rejects(rejects_file, fmt, on_invalid) as rejects:
+            for chunk in _score_chunks(file_path, chunksize, needed, keys):
+                chunk = rejects.check(chunk)
+                codes = analyze_frame(chunk, calibration_threshold).codes
+                group_counts.append(_count_groups(chunk[group_by], codes))
+    except InvalidScoresError as e:
+        print(f"Error: {e}")
+        return None
+    except Exception as e:
+        print(f"Error reading the input file: {e}")
+        return None
+    rejects.report()
+    
+    counts = group_counts[0]
+    if len(group_counts) > 1:
+        # The same group can appear in several chunks
+        counts = pd.concat(group_counts).groupby(level=list(range(len(group_by))), dropna=False, sort=True).sum()
+    
+    # One row per group and category, categories in their usual order
+    summary = counts.stack().rename('Count').reset_index()
+    summary.columns = group_by + ['Category', 'Count']
+    totals = summary.groupby(group_by, dropna=False, sort=False)['Count'].transform('sum')
+    summary['Percentage'] = (summary['Count'] / totals * 100).round(1)
+    
+    summary_file = output_path(output_dir, f"confidence_group_summary_{timestamp}", fmt)
+    write_table(summary, summary_file, fmt)
+    print(f"Grouped analysis complete: {len(counts)} groups. Summary saved to {summary_file}")
+    
+    if plots:
+        chart_dir = os.path.join(output_dir, f"confidence_group_charts_{timestamp}")
+        os.makedirs(chart_dir, exist_ok=True)
+        finish_plots(start_group_plots(counts, group_by, chart_dir, render_workers))
+    
+    return summary
+
+def _count_groups(keys, codes):
+    """
+    Category counts per group of one chunk.
+    
+    Returns:
+        DataFrame indexed by the group keys with one count column per category
+    """
+    grouped = keys.groupby(list(keys.columns), dropna=False, observed=True, sort=True)
+    group_ids = grouped.ngroup().values
+    index = grouped.size().index
+    counts = np.bincount(group_ids * len(CATEGORIES) + codes, minlength=len(index) * len(CATEGORIES))
+    return pd.DataFrame(counts.reshape(len(index), len(CATEGORIES)), index=index, columns=list(CATEGORIES))
+
+def start_group_plots(counts, group_by, chart_dir, render_workers=DEFAULT_RENDER_WORKERS):
     """
-    Create visualizations for the confidence analysis.
+    Start rendering one distribution bar chart per group.
     
     Args:
-        df: DataFrame containing the analyzed data
-        output_dir: Directory to save the output files
+        counts: Per-group category counts (see _count_groups)
+        group_by: Names of the group columns, for the chart titles
+        chart_dir: Directory to save the charts in
+        render_workers: Number of worker processes (0 renders them in this process)
+    
+    Returns:
+        The FigureRenderer; pass it to finish_plots
+    """
+    import re
+    from confidence_figures import FigureRenderer, render_distribution
+    
+    renderer = FigureRenderer(render_workers)
+    used = set()
+    for key, row in zip(counts.index, counts.values):
+        key = key if isinstance(key, tuple) else (key,)
+        name = re.sub(r'[^\w.-]+', '_', '_'.join(str(value) for value in key)).strip('_') or 'group'
+        unique = name
+        while unique in used:
+            unique = f"{name}_{len(used)}"
+        used.add(unique)
+        title = ', '.join(f"{col} = {value}" for col, value in zip(group_by, key))
+        renderer.submit(render_distribution, os.path.join(chart_dir, f"confidence_distribution_{unique}.png"),
+                        list(CATEGORIES), row, title=f"Distribution of Confidence Categories ({title})")
+    return renderer
+
+def check_cache(file_path, output_dir, use_cache, cache_dir=None, streaming=False, quiet=False, **params):
+    """
+    Look up the outputs of an identical earlier run and copy them to output_dir.
+    
+    A cache that can't be used (e.g. an unwritable home directory) is
+    skipped with a note; the analysis itself never fails because of it.
+    
+    Args:
+        file_path: Input file
+        output_dir: Where the restored outputs go, with fresh timestamps
+        use_cache: If False, skip the cache entirely
+        cache_dir: Cache directory (default: see ResultCache)
+        streaming: Return the summary (as streaming runs do) instead of the labeled rows
+        quiet: If True, print nothing (for callers that report on their own, like the GUI)
+        **params: Every parameter that changes the outputs; must include
+            output_format and plots
+    
+    Returns:
+        Tuple of (cache, key, result); result is None on a miss and cache
+        is None when the cache is not used
+    """
+    if not use_cache:
+        return None, None, None
+    
+    try:
+        cache = ResultCache(cache_dir)
+        key = cache.key(file_path, **params)
+        cached = cache.lookup(key)
+        if cached is None:
+            return cache, key, None
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        fmt = params['output_format']
+        names = {
+            'results': f"confidence_analysis_results_{timestamp}.{fmt}",
+            'summary': f"confidence_analysis_summary_{timestamp}.{fmt}",
+        }
+        if params['plots']:
+            names.update({role: os.path.basename(path) for role, path in chart_paths('', timestamp).items()})
+        if 'rejects' in cached:
+            names['rejects'] = f"confidence_analysis_rejects_{timestamp}.{fmt}"
+        restored = restore_files(cached, output_dir, names)
+        summary = read_table(restored['summary'], fmt)
+    except (OSError, KeyError) as e:
+        if not quiet:
+            print(f"Note: result cache unavailable ({e}); running the full analysis.")
+        return None, None, None
+    
+    if not quiet:
+        if 'rejects' in restored:
+            print(f"Note: rows with invalid scores were left out; see {restored['rejects']}")
+        print(f"Analysis complete (reused cached results). Results saved to {output_dir}")
+        print("\nSummary of Confidence Categories:")
+        print(summary.to_string(index=False))
+    if streaming:
+        return cache, key, summary
+    
+    df = read_table(restored['results'], fmt)
+    df['Confidence Category'] = pd.Categorical(df['Confidence Category'], categories=CATEGORIES)
+    return cache, key, df
+
+def store_in_cache(cache, key, output_file, summary_file, output_dir, timestamp, plots, rejects_file=None):
+    """Add a finished run's outputs to the cache; a failure only prints a note."""
+    files = {'results': output_file, 'summary': summary_file}
+    if plots:
+        files.update(chart_paths(output_dir, timestamp))
+    if rejects_file is not None and os.path.exists(rejects_file):
+        files['rejects'] = rejects_file
+    try:
+        cache.store(key, files)
+    except OSError as e:
+        print(f"Note: could not store the results in the cache ({e}).")
+
+def read_scores_table(file_path, columns=None, text_columns=()):
+    """
+    Read a whole table; if a score isn't a number, read the scores as text so the validation can report it.
+    """
+    try:
+        return read_table(file_path, columns=columns, text_columns=text_columns)
+    except ValueError:
+        return read_table(file_path, columns=columns, text_scores=True, text_columns=text_columns)
+
+def _score_chunks(file_path, chunksize, columns, text_columns=()):
+    """The table in chunks of `chunksize` rows, or as one chunk without a chunksize."""
+    if not chunksize:
+        return [read_scores_table(file_path, columns, text_columns)]
+    return with_text_score_fallback(
+        lambda text_scores: iter_table_chunks(file_path, chunksize, columns=columns, text_scores=text_scores,
+                                              text_columns=text_columns))
+
+class Rejects:
+    """
+    Validate chunks of rows and collect the ones with invalid scores.
+    
+    The rejects file is only created once the first invalid row turns up,
+    so in 'fail' mode it is never created.
+    
+    Args:
+        file_path: Rejects file
+        fmt: Its format
+        on_invalid: One of INVALID_ACTIONS
+        append: Extend an existing CSV rejects file instead of replacing it
+        header: Write a header row (CSV only)
+    """
+    
+    def __init__(self, file_path, fmt, on_invalid='reject', append=False, header=True):
+        self.file_path = file_path
+        self.fmt = fmt
+        self.on_invalid = on_invalid
+        self.count = 0
+        self._append = append
+        self._header = header
+        self._writer = None
+        # Rows rejected by an earlier run don't belong to this one
+        if not append and os.path.exists(file_path):
+            os.remove(file_path)
+    
+    def check(self, chunk):
+        """
+        Validate a chunk (see confidence_analysis.validate_scores).
+        
+        Returns:
+            The rows to analyze, with numeric score columns
+        
+        Raises:
+            InvalidScoresError: In 'fail' mode, if a row is invalid
+        """
+        chunk, rejected = validate_scores(chunk)
+        if rejected is None:
+            return chunk
+        if self.on_invalid == 'fail':
+            first = rejected.iloc[0]
+            raise InvalidScoresError(
+                f"Found rows with invalid scores, the first with Quiz Score "
+                f"{first['Quiz Score']!r} and Confidence Score {first['Confidence Score']!r}: "
+                f"{first[REJECTION_COLUMN]}. Use --on-invalid reject to leave such rows out.")
+        self.count += len(rejected)
+        if self.on_invalid == 'keep':
+            return chunk
+        if self._writer is None:
+            append = self._append and os.path.exists(self.file_path)
+            self._writer = TableWriter(self.file_path, self.fmt, header=self._header, append=append)
+        if self.fmt != 'csv':
+            # Chunks read before and after a switch to text scores must share one schema
+            rejected = rejected.astype({col: 'string' for col in ('Quiz Score', 'Confidence Score')})
+        self._writer.write(rejected)
+        return chunk.drop(index=rejected.index)
+    
+    def report(self):
+        """Print how many rows were invalid and what happened to them."""
+        Rejects.report_count(self.count, self.on_invalid, self.file_path)
+    
+    @staticmethod
+    def report_count(count, on_invalid, file_path):
+        if not count:
+            return
+        if on_invalid == 'keep':
+            print(f"Note: {count} rows have missing, non-numeric or out-of-range scores; they were analyzed anyway.")
+        else:
+            print(f"Note: {count} rows have missing, non-numeric or out-of-range scores; "
+                  f"they were left out and saved to {file_path}")
+    
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+def _label_chunks(chunks, out, calibration_threshold, rejects=None):
+    """
+    Label each chunk and append it to the TableWriter `out`.
+    
+    Args:
+        chunks: Iterable of DataFrames
+        out: TableWriter for the labeled rows
+        calibration_threshold: The threshold to determine if confidence is calibrated
+        rejects: Rejects that validates each chunk first (None to skip validation)
+    
+    Returns:
+        Tuple of (category counts, per-category density histograms)
+    """
+    category_counts = np.zeros(len(CATEGORIES), dtype=np.int64)
+    histograms = np.zeros((len(CATEGORIES), DENSITY_BINS, DENSITY_BINS), dtype=np.int64)
+    for chunk in chunks:
+        if rejects is not None:
+            chunk = rejects.check(chunk)
+        analysis = analyze_frame(chunk, calibration_threshold)
+        chunk['Confidence Category'] = analysis.labels
+        out.write(chunk)
+        category_counts += analysis.counts
+        histograms += category_histograms(chunk['Quiz Score'].values, chunk['Confidence Score'].values,
+                                          analysis.codes)
+    return category_counts, histograms
+
+class _ByteRange:
+    """Read-only file object limited to the bytes [start, end) of a file."""
+    
+    def __init__(self, path, start, end):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._remaining = end - start
+    
+    def read(self, size=-1):
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+    
+    def close(self):
+        self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+def _shard_ranges(file_path, shards):
+    """
+    Split the data rows of a CSV file into byte ranges aligned to line starts.
+    
+    Quoted fields containing line breaks are not supported in sharded mode.
+    
+    Returns:
+        List of (start, end) byte offsets, skipping the header line
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        f.readline()
+        data_start = f.tell()
+        bounds = [data_start]
+        for i in range(1, shards):
+            target = data_start + (size - data_start) * i // shards
+            if target <= bounds[-1]:
+                continue
+            # Move to the start of the next line
+            f.seek(target - 1)
+            f.readline()
+            if f.tell() > bounds[-1]:
+                bounds.append(min(f.tell(), size))
+        bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+def _range_chunks(file_path, start, end, columns, chunksize, text_scores=False):
+    """Parse the CSV rows in the bytes [start, end) of a file in chunks."""
+    with _ByteRange(file_path, start, end) as data:
+        yield from pd.read_csv(data, header=None, names=columns,
+                               dtype=column_dtypes(columns, chunked=True, text_scores=text_scores),
+                               chunksize=chunksize)
+
+def _label_shard(file_path, start, end, columns, calibration_threshold, chunksize, part_file, fmt, on_invalid,
+                 rejects_part):
+    """Worker: label one byte range of the input into headerless part files."""
+    chunks = with_text_score_fallback(
+        lambda text_scores: _range_chunks(file_path, start, end, columns, chunksize, text_scores))
+    with TableWriter(part_file, fmt, header=False) as out, \
+            Rejects(rejects_part, fmt, on_invalid, header=False) as rejects:
+        category_counts, histograms = _label_chunks(chunks, out, calibration_threshold, rejects)
+    return category_counts, histograms, rejects.count
+
+def _merge_parts(output_file, fmt, header, part_files, chunksize, text_scores=False):
+    """Concatenate headerless part files into one table, in order."""
+    with TableWriter(output_file, fmt) as out:
+        if fmt == 'csv':
+            out.write(pd.DataFrame(columns=header))
+            for part in part_files:
+                if os.path.exists(part):
+                    out.append_csv_rows(part)
+        else:
+            for part in part_files:
+                if os.path.exists(part):
+                    for chunk in iter_table_chunks(part, chunksize, fmt, text_scores=text_scores):
+                        out.write(chunk)
+
+def _label_sharded(file_path, output_file, fmt, columns, calibration_threshold, chunksize, workers,
+                   on_invalid='reject', rejects_file=None):
+    """
+    Label a CSV file in parallel worker processes and merge the results.
+    
+    Returns:
+        Tuple of (category counts, per-category density histograms, rejected rows) over the whole file
+    """
+    ranges = _shard_ranges(file_path, workers)
+    part_files = [f"{output_file}.part{i}" for i in range(len(ranges))]
+    rejects_parts = [f"{rejects_file}.part{i}" for i in range(len(ranges))]
+    category_counts = np.zeros(len(CATEGORIES), dtype=np.int64)
+    histograms = np.zeros((len(CATEGORIES), DENSITY_BINS, DENSITY_BINS), dtype=np.int64)
+    rejected = 0
+    
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_label_shard, file_path, start, end, columns, calibration_threshold, chunksize,
+                            part, fmt, on_invalid, rejects_part)
+                for (start, end), part, rejects_part in zip(ranges, part_files, rejects_parts)
+            ]
+            for future in futures:
+                shard_counts, shard_histograms, shard_rejected = future.result()
+                category_counts += shard_counts
+                histograms += shard_histograms
+                rejected += shard_rejected
+        
+        # Merge the shards in file order
+        _merge_parts(output_file, fmt, columns + ['Confidence Category'], part_files, chunksize)
+        if any(os.path.exists(part) for part in rejects_parts):
+            _merge_parts(rejects_file, fmt, columns + [REJECTION_COLUMN], rejects_parts, chunksize,
+                         text_scores=True)
+    finally:
+        for part in part_files + rejects_parts:
+            if os.path.exists(part):
+                os.remove(part)
+    
+    return category_counts, histograms, rejected
+
+def record_history(history_file, file_path, calibration_threshold, output_file, df=None):
+    """
+    Add a finished run to the run history database (see confidence_history).
+    
+    The labeled rows are taken from `df`, or read back from the results
+    file when the run didn't keep them in memory. A failure only prints a
+    note; the run's outputs are already saved.
+    
+    Returns:
+        The run's id, or None if it couldn't be recorded
+    """
+    import sqlite3
+    from confidence_history import RunHistory, record_results_file
+    
+    try:
+        if df is not None:
+            with RunHistory(history_file) as history:
+                run_id = history.record_run(file_path, calibration_threshold, [df], output_file)
+        else:
+            run_id = record_results_file(history_file, output_file, file_path, calibration_threshold)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Note: could not record the run in {history_file} ({e}).")
+        return None
+    print(f"Run {run_id} recorded in {history_file}")
+    return run_id
+
+def start_plots(summary, output_dir, timestamp, calibration_threshold=5, render_workers=DEFAULT_RENDER_WORKERS,
+                **scatter):
+    """
+    Start rendering the scatter plot and the distribution bar chart.
+    
+    The charts are drawn with the Figure API in worker processes (see
+    confidence_figures.FigureRenderer), so the caller can write tables and
+    report results while the PNGs are being saved.
+    
+    Args:
+        summary: Summary DataFrame (see summarize_counts); its order is the legend order,
+            and its confidence intervals, if any, are drawn as error bars
+        output_dir: Directory to save the charts in
         timestamp: Timestamp string for file naming
+        calibration_threshold: Threshold drawn around the perfect calibration line
+        render_workers: Number of worker processes (0 renders right away in this process)
+        **scatter: Data for the scatter plot (see confidence_figures.scatter_data)
+    
+    Returns:
+        The FigureRenderer; pass it to finish_plots
+    """
+    from confidence_figures import FigureRenderer, render_distribution, render_scatter
+    
+    categories = list(summary['Category'])
+    intervals = None
+    if CI_COLUMNS[0] in summary.columns:
+        # Error bars in users, from the interval percentages
+        total = summary['Count'].sum()
+        intervals = [summary[col].values / 100 * total for col in CI_COLUMNS]
+    paths = chart_paths(output_dir, timestamp)
+    renderer = FigureRenderer(render_workers)
+    renderer.submit(render_scatter, paths['scatter'], categories, calibration_threshold, **scatter)
+    renderer.submit(render_distribution, paths['distribution'], categories, summary['Count'].values,
+                    intervals=intervals)
+    return renderer
+
+def print_ci_note(bootstrap, ci_level, seed):
+    """Explain the confidence interval columns of a printed summary (nothing without bootstrap)."""
+    if bootstrap:
+        print(f"\n{' / '.join(CI_COLUMNS)}: {ci_level:.0%} bootstrap interval of the percentage "
+              f"({bootstrap} resamples, seed {seed})")
+
+def chart_paths(output_dir, timestamp):
+    """Paths of the scatter plot and distribution chart PNGs of a run."""
+    return {
+        'scatter': os.path.join(output_dir, f"confidence_scatter_plot_{timestamp}.png"),
+        'distribution': os.path.join(output_dir, f"confidence_distribution_{timestamp}.png"),
+    }
+
+def finish_plots(renderer):
+    """
+    Wait for the charts started by start_plots, reporting each one as it is saved.
+    
+    Returns:
+        True if every chart was saved
     """
-    # Create a scatter plot
-    plt.figure(figsize=(10, 8))
-    categories = df['Confidence Category'].unique()
-    colors = plt.cm.tab10(np.linspace(0, 1, len(categories)))
-    
-    for i, category in enumerate(categories):
-        subset = df[df['Confidence Category'] == category]
-        plt.scatter(subset['Quiz Score'], subset['Confidence Score'], 
-                   label=category, color=colors[i], alpha=0.7)
-    
-    # Add the y=x line (perfect calibration)
-    plt.plot([0, 100], [0, 100], 'k--', label='Perfect Calibration')
-    # Add the +5% and -5% calibration threshold lines
-    plt.plot([0, 100], [5, 105], 'r:', label='+5% Threshold')
-    plt.plot([0, 100], [-5, 95], 'r:', label='-5% Threshold')
-    
-    plt.xlabel('Quiz Score (%)')
-    plt.ylabel('Confidence Score (%)')
-    plt.title('Quiz Score vs Confidence Analysis')
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
-    
-    scatter_file = os.path.join(output_dir, f"confidence_scatter_plot_{timestamp}.png")
-    plt.savefig(scatter_file)
-    
-    # Create a bar chart for the summary
-    summary = df['Confidence Category'].value_counts().sort_values(ascending=False)
-    plt.figure(figsize=(12, 6))
-    summary.plot(kind='bar', color=colors[:len(summary)])
-    plt.xlabel('Confidence Category')
-    plt.ylabel('Number of Users')
-    plt.title('Distribution of Confidence Categories')
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    
-    bar_file = os.path.join(output_dir, f"confidence_distribution_{timestamp}.png")
-    plt.savefig(bar_file)
-    
-    # Close the plots to free memory
-    plt.close('all')
+    saved = True
+    with renderer:
+        for file_path, error in renderer.completed():
+            if error is None:
+                print(f"Saved {file_path}")
+            else:
+                print(f"Error rendering {file_path}: {error}")
+                saved = False
+    return saved
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python analyze_confidence.py <path_to_csv_file> [output_directory] [calibration_threshold]")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Analyze quiz score vs. confidence data.")
+    parser.add_argument("file_path", help="Path to the CSV, Parquet or Feather file containing the data")
+    parser.add_argument("output_dir", nargs="?", default=None,
+                        help="Directory to save the output files (default: same as input file)")
+    parser.add_argument("calibration_threshold", nargs="?", type=int, default=5,
+                        help="Threshold (in percentage points) to determine if confidence is calibrated (default: 5)")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Stream the file in chunks of this many rows to bound memory use")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Split the file across N worker processes (implies streaming mode)")
+    parser.add_argument("--render-mode", choices=RENDER_MODES, default='auto',
+                        help="Draw one marker per user, a density grid, or pick by file size (default: auto)")
+    parser.add_argument("--format", choices=FORMATS, default=None, dest="output_format",
+                        help="Format of the results and summary tables (default: same as the input file)")
+    parser.add_argument("--no-plots", action="store_false", dest="plots",
+                        help="Only write the results and summary tables; skip the charts (faster startup)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Write a JSON report with the wall time, CPU time and peak memory of each stage")
+    parser.add_argument("--cprofile", default=None, metavar="STAGE", dest="cprofile_stage",
+                        help="Also run one stage (e.g. read, categorize, write_results, render_submit) under "
+                             "cProfile and save the .prof dump next to the outputs; implies --profile")
+    parser.add_argument("--profile-memory", action="store_true", dest="trace_memory",
+                        help="Also measure each stage's peak allocations with tracemalloc (slower); implies --profile")
+    parser.add_argument("--render-workers", type=int, default=DEFAULT_RENDER_WORKERS,
+                        help="Processes that render the charts in the background; 0 renders them in-process "
+                             f"(default: {DEFAULT_RENDER_WORKERS})")
+    parser.add_argument("--no-cache", action="store_false", dest="use_cache",
+                        help="Always run the full analysis instead of reusing cached results of an identical run")
+    parser.add_argument("--grid", action="store_true",
+                        help="Count the categories for every combination of --thresholds, --high-cutoffs and "
+                             "--strong-cutoffs and write one tidy table instead of the usual outputs")
+    parser.add_argument("--thresholds", type=parse_grid_values, default=None,
+                        help="Grid calibration thresholds, e.g. 0:20:0.5 or 2,5,10 (default: calibration_threshold)")
+    parser.add_argument("--high-cutoffs", type=parse_grid_values, default=[HIGH_SCORE_CUTOFF],
+                        help=f"Grid high-score cutoffs, e.g. 50:90:5 (default: {HIGH_SCORE_CUTOFF})")
+    parser.add_argument("--strong-cutoffs", type=parse_grid_values, default=[STRONG_MISCALIBRATION_CUTOFF],
+                        help=f"Grid strong-miscalibration cutoffs, e.g. 10:40:5 (default: {STRONG_MISCALIBRATION_CUTOFF})")
+    parser.add_argument("--group-by", type=lambda s: [col.strip() for col in s.split(',')], default=None,
+                        metavar="COLUMNS",
+                        help="Comma-separated columns (e.g. Class,Quiz) to summarize per group in one pass, "
+                             "writing one consolidated summary instead of the usual outputs")
+    parser.add_argument("--group-plots", action="store_true",
+                        help="With --group-by, also draw a distribution bar chart per group")
+    parser.add_argument("--on-invalid", choices=INVALID_ACTIONS, default='reject',
+                        help="Rows with missing, non-numeric or out-of-range scores: leave them out and save them to "
+                             "a rejects file, stop with an error, or analyze them anyway (default: reject)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only analyze the rows appended to a CSV file since the last --incremental run")
+    parser.add_argument("--bootstrap", type=int, default=0, metavar="RESAMPLES",
+                        help="Add confidence intervals of the category percentages from this many bootstrap "
+                             f"resamples (e.g. {DEFAULT_RESAMPLES}) to the summary, and error bars to the "
+                             "distribution chart")
+    parser.add_argument("--ci-level", type=float, default=DEFAULT_LEVEL,
+                        help=f"Confidence level of the --bootstrap intervals (default: {DEFAULT_LEVEL})")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED,
+                        help=f"Seed of the --bootstrap resampling; the same seed gives the same intervals "
+                             f"(default: {DEFAULT_SEED})")
+    parser.add_argument("--history", default=None, metavar="DB_FILE",
+                        help="Also add the labeled rows and category counts of this run to a SQLite run history "
+                             "database; query it with confidence_history.py")
+    args = parser.parse_args()
+    if args.bootstrap < 0:
+        parser.error("--bootstrap needs a positive number of resamples")
+    if not 0 < args.ci_level < 1:
+        parser.error("--ci-level must be between 0 and 1, e.g. 0.95")
     
-    file_path = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else None
-    calibration_threshold = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    if args.grid:
+        result = analyze_confidence_grid(args.file_path, args.output_dir,
+                                         args.thresholds or [args.calibration_threshold], args.high_cutoffs,
+                                         args.strong_cutoffs, args.chunksize, args.output_format, args.on_invalid)
+        sys.exit(0 if result is not None else 1)
     
-    analyze_confidence_data(file_path, output_dir, calibration_threshold)
+    if args.group_by:
+        result = analyze_confidence_groups(args.file_path, args.group_by, args.output_dir,
+                                           args.calibration_threshold, args.chunksize, args.output_format,
+                                           args.group_plots, args.render_workers, args.on_invalid)
+        sys.exit(0 if result is not None else 1)
+    
+    result = analyze_confidence_data(args.file_path, args.output_dir, args.calibration_threshold,
+                                     chunksize=args.chunksize, workers=args.workers,
+                                     render_mode=args.render_mode, output_format=args.output_format,
+                                     plots=args.plots, profile=args.profile, cprofile_stage=args.cprofile_stage,
+                                     trace_memory=args.trace_memory, render_workers=args.render_workers,
+                                     use_cache=args.use_cache, incremental=args.incremental,
+                                     on_invalid=args.on_invalid, bootstrap=args.bootstrap, ci_level=args.ci_level,
+                                     seed=args.seed, history=args.history)
+    if result is None:
+        sys.exit(1)
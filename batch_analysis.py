@@ -0,0 +1,188 @@
+import os
+# Batch runs never open windows. Setting the backend through the environment
+# (instead of matplotlib.use) keeps matplotlib unloaded for --no-plots runs.
+os.environ['MPLBACKEND'] = 'Agg'
+
+import pandas as pd
+import glob
+import io
+import sys
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from confidence_analysis import summarize_counts
+from analyze_confidence import INVALID_ACTIONS, analyze_confidence_data
+from confidence_engine import CATEGORIES
+from confidence_io import EXTENSIONS, FORMATS
+
+# Name prefixes of the files the analysis and batch runs write. Reports are
+# saved next to the inputs by default, so they must not be picked up as
+# cohorts by the next run over the same directory.
+OUTPUT_PREFIXES = ('batch_summary_index_', 'batch_failures_', 'confidence_analysis_', 'confidence_grid_',
+                   'confidence_group_summary_', 'confidence_selection_', 'interactive_analysis_')
+
+def find_input_files(pattern):
+    """
+    Expand a directory or glob pattern into a sorted list of input files.
+
+    Files written by earlier runs (see OUTPUT_PREFIXES) are skipped.
+
+    Args:
+        pattern: A directory (all CSV, Parquet and Feather files in it are used) or a glob pattern
+
+    Returns:
+        Sorted list of file paths
+    """
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, name) for name in os.listdir(pattern)
+                 if os.path.splitext(name)[1].lower() in EXTENSIONS]
+    else:
+        paths = glob.glob(pattern)
+    return sorted(path for path in paths
+                  if os.path.isfile(path) and not os.path.basename(path).startswith(OUTPUT_PREFIXES))
+
+def analyze_one(file_path, output_dir, calibration_threshold=5, chunksize=None, output_format=None, plots=True,
+                use_cache=True, on_invalid='reject'):
+    """
+    Analyze a single file inside a batch worker.
+
+    The analysis output is captured instead of printed, so messages from
+    parallel workers don't interleave and errors can go to the failure report.
+    Charts are rendered in the worker itself, since the batch pool already
+    keeps every CPU busy.
+
+    Returns:
+        Tuple of (file_path, output_dir, summary DataFrame or None, captured output or error message)
+    """
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            result = analyze_confidence_data(file_path, output_dir, calibration_threshold, chunksize=chunksize,
+                                             output_format=output_format, plots=plots,
+                                             render_workers=0, use_cache=use_cache, on_invalid=on_invalid)
+    except Exception as e:
+        return file_path, output_dir, None, f"{type(e).__name__}: {e}"
+
+    if result is None:
+        return file_path, output_dir, None, log.getvalue().strip()
+
+    # In-memory runs return the labeled rows, streaming runs the summary
+    if 'Confidence Category' in result.columns:
+        counts = result['Confidence Category'].value_counts().reindex(CATEGORIES, fill_value=0)
+        result = summarize_counts(counts.values)
+    return file_path, output_dir, result, log.getvalue().strip()
+
+def run_batch(pattern, output_root=None, calibration_threshold=5, workers=None, chunksize=None,
+              output_format=None, plots=True, use_cache=True, on_invalid='reject'):
+    """
+    Analyze every file matching a directory or glob in one process pool.
+
+    Each file's outputs go to its own results_<name> folder under
+    output_root. A failed file is recorded in the failure report and the
+    rest of the batch keeps going.
+
+    Args:
+        pattern: Directory or glob pattern of files to analyze
+        output_root: Directory for the per-file folders and batch reports (default: the input directory)
+        calibration_threshold: The threshold to determine if confidence is calibrated
+        workers: Number of worker processes (default: number of CPUs)
+        chunksize: If set, stream each file in chunks of this many rows
+        output_format: Format of each file's results and summary tables (default: same as the input file)
+        plots: If False, only write the tables and skip the charts
+        use_cache: Reuse cached outputs of files analyzed before with the same parameters
+        on_invalid: What to do with rows with invalid scores (see analyze_confidence.INVALID_ACTIONS)
+
+    Returns:
+        Tuple of (index DataFrame, failures DataFrame), or None if no files matched
+    """
+    files = find_input_files(pattern)
+    if not files:
+        print(f"Error: No input files found for '{pattern}'.")
+        return None
+
+    if output_root is None:
+        output_root = pattern if os.path.isdir(pattern) else os.path.dirname(files[0])
+    os.makedirs(output_root, exist_ok=True)
+
+    index_rows = []
+    failures = []
+    print(f"Analyzing {len(files)} files...")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for file_path in files:
+            name = os.path.splitext(os.path.basename(file_path))[0]
+            output_dir = os.path.join(output_root, f"results_{name}")
+            future = pool.submit(analyze_one, file_path, output_dir, calibration_threshold, chunksize,
+                                 output_format, plots, use_cache, on_invalid)
+            futures[future] = file_path
+
+        for future in as_completed(futures):
+            try:
+                file_path, output_dir, summary, message = future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. out of memory)
+                print(f"FAILED  {futures[future]}")
+                failures.append({'File': futures[future], 'Error': f"{type(e).__name__}: {e}"})
+                continue
+
+            if summary is None:
+                print(f"FAILED  {file_path}")
+                failures.append({'File': file_path, 'Error': message or "Unknown error"})
+                continue
+
+            print(f"OK      {file_path}")
+            for _, row in summary.iterrows():
+                index_rows.append({
+                    'File': file_path,
+                    'Output Directory': output_dir,
+                    'Category': row['Category'],
+                    'Count': row['Count'],
+                    'Percentage': row['Percentage'],
+                })
+
+    index = pd.DataFrame(index_rows, columns=['File', 'Output Directory', 'Category', 'Count', 'Percentage'])
+    index = index.sort_values(['File', 'Count'], ascending=[True, False], kind='stable')
+    failures = pd.DataFrame(failures, columns=['File', 'Error']).sort_values('File')
+
+    # Save the combined reports
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    index_file = os.path.join(output_root, f"batch_summary_index_{timestamp}.csv")
+    index.to_csv(index_file, index=False)
+    failures_file = os.path.join(output_root, f"batch_failures_{timestamp}.csv")
+    failures.to_csv(failures_file, index=False)
+
+    n_ok = index['File'].nunique()
+    print(f"\nBatch complete: {n_ok} succeeded, {len(failures)} failed.")
+    print(f"Summary index saved to {index_file}")
+    print(f"Failure report saved to {failures_file}")
+
+    return index, failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze every CSV export in a directory or glob.")
+    parser.add_argument("input", help="Directory or glob pattern (quote it) of CSV, Parquet or Feather files")
+    parser.add_argument("output_root", nargs="?", default=None,
+                        help="Directory for the results_<name> folders and batch reports (default: input directory)")
+    parser.add_argument("calibration_threshold", nargs="?", type=int, default=5,
+                        help="Threshold (in percentage points) to determine if confidence is calibrated (default: 5)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Stream each file in chunks of this many rows to bound memory use")
+    parser.add_argument("--format", choices=FORMATS, default=None, dest="output_format",
+                        help="Format of each file's results and summary tables (default: same as the input file)")
+    parser.add_argument("--no-plots", action="store_false", dest="plots",
+                        help="Only write the results and summary tables; skip the charts")
+    parser.add_argument("--no-cache", action="store_false", dest="use_cache",
+                        help="Always run the full analysis instead of reusing cached results")
+    parser.add_argument("--on-invalid", choices=INVALID_ACTIONS, default='reject',
+                        help="Rows with missing, non-numeric or out-of-range scores: leave them out and save them to "
+                             "a rejects file, stop with an error, or analyze them anyway (default: reject)")
+    args = parser.parse_args()
+
+    result = run_batch(args.input, args.output_root, args.calibration_threshold, args.workers, args.chunksize,
+                       args.output_format, args.plots, args.use_cache, args.on_invalid)
+    if result is None or len(result[1]) > 0:
+        sys.exit(1)
@@ -0,0 +1,77 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+# Rows generated and written per step, so 10^7-row cohorts don't need the
+# whole frame in memory
+GENERATE_CHUNK_ROWS = 1000000
+
+def generate_cohort(rows, seed=0, missing_fraction=0.0, users=None):
+    """
+    Generate a synthetic cohort of quiz attempts in chunks.
+
+    Quiz scores are whole percentages around 65, and confidence scores
+    follow the quiz score with a per-row bias, so every confidence category
+    is well represented. The same rows and seed always give the same data.
+
+    Args:
+        rows: Number of rows to generate
+        seed: Seed for the random generator
+        missing_fraction: Fraction of rows with a missing confidence score
+        users: Number of distinct user names (default: one per 10 rows)
+
+    Yields:
+        DataFrames with 'User Name', 'Quiz Score' and 'Confidence Score' columns
+    """
+    rng = np.random.default_rng(seed)
+    users = users or max(1, rows // 10)
+    for start in range(0, rows, GENERATE_CHUNK_ROWS):
+        n = min(GENERATE_CHUNK_ROWS, rows - start)
+        quiz = np.clip(np.rint(rng.normal(65, 18, n)), 0, 100)
+        confidence = np.clip(np.rint(quiz + rng.normal(3, 22, n)), 0, 100)
+        if missing_fraction:
+            confidence[rng.random(n) < missing_fraction] = np.nan
+        names = np.char.add('user_', rng.integers(0, users, n).astype(str))
+        yield pd.DataFrame({'User Name': names, 'Quiz Score': quiz, 'Confidence Score': confidence})
+
+def write_cohort(file_path, rows, seed=0, missing_fraction=0.0):
+    """Write a synthetic cohort (see generate_cohort) to a CSV file."""
+    header = True
+    with open(file_path, 'w', newline='') as f:
+        for chunk in generate_cohort(rows, seed, missing_fraction):
+            chunk.to_csv(f, header=header, index=False)
+            header = False
+    return file_path
+
+def cohort_path(data_dir, rows, seed=0):
+    """
+    Return the path of a cached cohort CSV, generating it on first use.
+
+    Args:
+        data_dir: Directory holding the generated files
+        rows: Number of rows
+        seed: Seed for the random generator
+
+    Returns:
+        Path to the CSV file
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    file_path = os.path.join(data_dir, f"cohort_{rows}_seed{seed}.csv")
+    if not os.path.exists(file_path):
+        # Write to a temporary name so an interrupted run never leaves a partial cohort behind
+        write_cohort(file_path + '.tmp', rows, seed)
+        os.replace(file_path + '.tmp', file_path)
+    return file_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic quiz score vs. confidence CSV.")
+    parser.add_argument("file_path", help="Path of the CSV file to write")
+    parser.add_argument("rows", type=int, help="Number of rows to generate")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the random generator (default: 0)")
+    parser.add_argument("--missing", type=float, default=0.0,
+                        help="Fraction of rows with a missing confidence score (default: 0)")
+    args = parser.parse_args()
+
+    write_cohort(args.file_path, args.rows, args.seed, args.missing)
+    print(f"Wrote {args.rows} rows to {args.file_path}")
@@ -0,0 +1,227 @@
+import os
+# Benchmarks never open windows
+os.environ['MPLBACKEND'] = 'Agg'
+
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import numpy as np
+import pandas as pd
+from generate_cohort import cohort_path
+from confidence_engine import CATEGORIES, ThresholdSweep, categorize_confidence_codes, category_column
+from confidence_bootstrap import DEFAULT_RESAMPLES
+from confidence_io import read_table, write_table
+from confidence_picking import PointIndex
+from analyze_confidence import analyze_confidence_data, summarize_counts
+
+DEFAULT_SIZES = (10**3, 10**4, 10**5, 10**6)
+
+# Thresholds the interactive slider is dragged through per recompute measurement
+SLIDER_THRESHOLDS = np.arange(0, 20.5, 0.5)
+
+# Mouse positions looked up per hover measurement
+PICK_QUERIES = 200
+
+def _time(func, repeat):
+    """Best wall time of `repeat` calls, and the result of the last call."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def benchmark_stages(file_path, work_dir, repeat=3, render=True):
+    """
+    Time each stage of an analysis of one file separately.
+
+    The stages are the same calls analyze_confidence_data and the GUI's
+    perform_analysis are built from, run back to back on the same data.
+
+    Args:
+        file_path: Input CSV file
+        work_dir: Scratch directory for the files the stages write
+        repeat: Runs per stage; the best time is kept
+        render: If False, skip the plot rendering stages
+
+    Returns:
+        Dict of stage name -> seconds
+    """
+    from confidence_figures import render_distribution, render_scatter, scatter_data
+
+    timings = {}
+    timings['read'], df = _time(lambda: read_table(file_path), repeat)
+    quiz = df['Quiz Score'].values
+    confidence = df['Confidence Score'].values
+
+    timings['categorize'], codes = _time(lambda: categorize_confidence_codes(quiz, confidence, 5), repeat)
+    timings['summary'], summary = _time(
+        lambda: summarize_counts(np.bincount(codes, minlength=len(CATEGORIES))), repeat)
+    timings['bootstrap'], _ = _time(
+        lambda: summarize_counts(np.bincount(codes, minlength=len(CATEGORIES)), DEFAULT_RESAMPLES), repeat)
+
+    df['Confidence Category'] = category_column(codes)
+    results_file = os.path.join(work_dir, "results.csv")
+    timings['write'], _ = _time(lambda: write_table(df, results_file), repeat)
+
+    if render:
+        # Rendered in this process, so the times are the rendering work itself
+        categories = list(summary['Category'])
+        scatter_file = os.path.join(work_dir, "scatter.png")
+        bar_file = os.path.join(work_dir, "distribution.png")
+        timings['scatter_render'], _ = _time(
+            lambda: render_scatter(scatter_file, categories, 5, **scatter_data(quiz, confidence, codes)), repeat)
+        timings['bar_render'], _ = _time(
+            lambda: render_distribution(bar_file, categories, summary['Count'].values), repeat)
+
+    # Interactive threshold changes: one-off setup, then counts and labels per slider step
+    timings['sweep_setup'], sweep = _time(lambda: ThresholdSweep(quiz, confidence), repeat)
+
+    def recompute():
+        for t in SLIDER_THRESHOLDS:
+            sweep.counts(t)
+            sweep.codes(t)
+
+    seconds, _ = _time(recompute, repeat)
+    timings['threshold_recompute'] = seconds / len(SLIDER_THRESHOLDS)
+
+    # Scatter plot picking: one-off index build, then a lookup per mouse move
+    timings['pick_index_setup'], index = _time(lambda: PointIndex(quiz, confidence), repeat)
+    rng = np.random.default_rng(0)
+    hover_points = rng.uniform(0, 100, size=(PICK_QUERIES, 2))
+
+    def hover():
+        for x, y in hover_points:
+            index.near(x, y, 0.5)
+
+    seconds, _ = _time(hover, repeat)
+    timings['pick_hover'] = seconds / PICK_QUERIES
+    return timings
+
+def benchmark_end_to_end(file_path, work_dir, repeat=1, plots=True):
+    """
+    Time a full analyze_confidence_data run, with its printed output suppressed.
+
+    The result cache is off, so every run does the full analysis and the
+    user's cache directory is left alone.
+    """
+    output_dir = os.path.join(work_dir, "end_to_end")
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = analyze_confidence_data(file_path, output_dir, 5, plots=plots, use_cache=False)
+        if result is None:
+            raise RuntimeError(f"analyze_confidence_data failed on {file_path}")
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    seconds, _ = _time(run, repeat)
+    return seconds
+
+def run_benchmarks(sizes=DEFAULT_SIZES, seed=0, data_dir=None, repeat=3, render=True):
+    """
+    Benchmark every stage at each cohort size.
+
+    Args:
+        sizes: Row counts to generate cohorts for
+        seed: Seed for the cohort generator
+        data_dir: Directory to cache generated cohorts in (default: benchmarks/data)
+        repeat: Runs per stage; the best time is kept
+        render: If False, skip plot rendering
+
+    Returns:
+        Dict ready to be written as JSON, with one record per (rows, stage)
+    """
+    data_dir = data_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    records = []
+    for rows in sizes:
+        file_path = cohort_path(data_dir, rows, seed)
+        work_dir = tempfile.mkdtemp(prefix="confidence_bench_")
+        try:
+            timings = benchmark_stages(file_path, work_dir, repeat, render)
+            timings['end_to_end'] = benchmark_end_to_end(file_path, work_dir, plots=render)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        for stage, seconds in timings.items():
+            records.append({'rows': rows, 'stage': stage, 'seconds': seconds})
+            print(f"{rows:>10}  {stage:<20} {seconds * 1000:10.1f} ms")
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'seed': seed,
+        'repeat': repeat,
+        'results': records,
+    }
+
+def compare_results(current, baseline, tolerance=0.25, min_seconds=0.005):
+    """
+    Find stages that got slower than in a baseline run.
+
+    Args:
+        current: Results from run_benchmarks
+        baseline: Results loaded from an earlier JSON file
+        tolerance: Allowed slowdown as a fraction (0.25 = 25% slower)
+        min_seconds: Ignore stages faster than this in both runs, since they are mostly noise
+
+    Returns:
+        List of regression descriptions
+    """
+    previous = {(r['rows'], r['stage']): r['seconds'] for r in baseline['results']}
+    regressions = []
+    for record in current['results']:
+        before = previous.get((record['rows'], record['stage']))
+        after = record['seconds']
+        if before is None or max(before, after) < min_seconds:
+            continue
+        if after > before * (1 + tolerance):
+            regressions.append(f"{record['stage']} at {record['rows']} rows: "
+                               f"{before * 1000:.1f} ms -> {after * 1000:.1f} ms")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark each analysis stage on synthetic cohorts.")
+    parser.add_argument("--sizes", type=lambda s: [int(float(x)) for x in s.split(',')], default=list(DEFAULT_SIZES),
+                        help="Comma-separated row counts, e.g. 1e3,1e5,1e7 (default: 1e3 to 1e6)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the cohort generator (default: 0)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the best time is kept (default: 3)")
+    parser.add_argument("--data-dir", default=None, help="Where to cache generated cohorts (default: benchmarks/data)")
+    parser.add_argument("--no-render", action="store_false", dest="render", help="Skip the plot rendering stages")
+    parser.add_argument("--output", default=None,
+                        help="JSON file to write the results to (default: benchmark_results_<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to check for regressions against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown against --compare as a fraction (default: 0.25)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.seed, args.data_dir, args.repeat, args.render)
+
+    output_file = args.output or f"benchmark_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output_file}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions.")
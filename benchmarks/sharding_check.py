@@ -0,0 +1,89 @@
+import os
+# The check never opens windows
+os.environ['MPLBACKEND'] = 'Agg'
+
+import io
+import sys
+import glob
+import argparse
+import tempfile
+import contextlib
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from generate_cohort import write_cohort
+from analyze_confidence import analyze_confidence_data
+
+# Output tables that must be byte-identical between a single-process and a sharded run
+COMPARED_OUTPUTS = ('confidence_analysis_results_', 'confidence_analysis_summary_', 'confidence_analysis_rejects_')
+
+def _outputs(output_dir):
+    """Contents of the compared output tables in output_dir, by name without the timestamp."""
+    outputs = {}
+    for prefix in COMPARED_OUTPUTS:
+        for path in glob.glob(os.path.join(output_dir, f"{prefix}*")):
+            with open(path, 'rb') as f:
+                outputs[prefix] = f.read()
+    return outputs
+
+def _run(file_path, output_dir, **options):
+    """Analyze file_path into output_dir without the cache, hiding the printed summary."""
+    with contextlib.redirect_stdout(io.StringIO()) as printed:
+        analyze_confidence_data(file_path, output_dir, use_cache=False, **options)
+    return printed.getvalue()
+
+def check_sharding(rows=20000, workers=2, chunksize=3000, seed=0):
+    """
+    Compare the outputs of single-process and sharded (--workers) runs.
+
+    A seeded cohort with some missing scores (so there are rejected rows)
+    and a header-only file are each analyzed in one process and with
+    `workers` shards. Their results, summary and rejects files must be the
+    same, and the header-only sharded run must still draw its scatter plot.
+
+    Returns:
+        List of failure messages (empty if the outputs match)
+    """
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cohort = write_cohort(os.path.join(tmp, 'cohort.csv'), rows, seed, missing_fraction=0.01)
+        empty = os.path.join(tmp, 'empty.csv')
+        with open(empty, 'w') as f:
+            f.write("User Name,Quiz Score,Confidence Score\n")
+
+        for name, file_path in (('cohort', cohort), ('header-only', empty)):
+            single_dir = os.path.join(tmp, f"{name}_single")
+            sharded_dir = os.path.join(tmp, f"{name}_sharded")
+            _run(file_path, single_dir, plots=False)
+            printed = _run(file_path, sharded_dir, workers=workers, chunksize=chunksize, plots=name == 'header-only')
+            single, sharded = _outputs(single_dir), _outputs(sharded_dir)
+
+            if not single:
+                failures.append(f"{name}: the single-process run wrote no results")
+            for prefix in sorted(set(single) | set(sharded)):
+                status = 'OK' if single.get(prefix) == sharded.get(prefix) else 'FAIL'
+                print(f"{status:<5} {name}: {prefix}*")
+                if status == 'FAIL':
+                    failures.append(f"{name}: {prefix}* differs between the single-process and sharded runs")
+            if name == 'header-only' and not glob.glob(os.path.join(sharded_dir, 'confidence_scatter_plot_*')):
+                print(f"FAIL  {name}: scatter plot")
+                failures.append(f"{name}: the sharded run drew no scatter plot ({printed.strip()[-200:]})")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check that --workers gives the same outputs as a single-process run.")
+    parser.add_argument("--rows", type=int, default=20000, help="Rows in the generated cohort (default: 20000)")
+    parser.add_argument("--workers", type=int, default=2, help="Shards of the sharded run (default: 2)")
+    parser.add_argument("--chunksize", type=int, default=3000,
+                        help="Rows per chunk in the sharded run (default: 3000)")
+    args = parser.parse_args()
+
+    failures = check_sharding(args.rows, args.workers, args.chunksize)
+    if failures:
+        print("\nSharding check failed:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nSharding check passed.")
@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry points that must stay cheap to import, with their budgets in seconds
+# (median over fresh interpreters) and modules they must not load at import
+# time. Summary-only runs (--no-plots) go through these imports.
+STARTUP_CHECKS = [
+    ('analyze_confidence', 0.6, ['matplotlib']),
+    ('batch_analysis', 0.6, ['matplotlib']),
+    ('confidence_engine', 0.3, ['pandas', 'matplotlib']),
+]
+
+# Prints the import time and the modules loaded, from inside a fresh interpreter
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'modules': sorted(sys.modules)}}))
+"""
+
+def measure_import(module, repeat=5):
+    """
+    Time importing a module in fresh interpreters.
+
+    Args:
+        module: Name of the module to import (from the repository root)
+        repeat: Number of interpreters to start
+
+    Returns:
+        Tuple of (median import time in seconds, set of modules loaded by the import)
+    """
+    times = []
+    loaded = set()
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', _PROBE.format(module=module)], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        times.append(result['seconds'])
+        loaded.update(result['modules'])
+    return statistics.median(times), loaded
+
+def check_startup(repeat=5, scale=1.0):
+    """
+    Check every entry point in STARTUP_CHECKS against its budget.
+
+    Args:
+        repeat: Number of fresh interpreters per module
+        scale: Multiplier for the budgets (e.g. 2 on slow CI machines)
+
+    Returns:
+        List of failure messages (empty if everything is within budget)
+    """
+    failures = []
+    for module, budget, forbidden in STARTUP_CHECKS:
+        seconds, loaded = measure_import(module, repeat)
+        budget *= scale
+        status = 'OK' if seconds <= budget else 'SLOW'
+        print(f"{status:<5} import {module}: {seconds * 1000:.0f} ms (budget {budget * 1000:.0f} ms)")
+        if seconds > budget:
+            failures.append(f"import {module} took {seconds:.2f}s, over the {budget:.2f}s budget")
+        for name in forbidden:
+            if name in loaded:
+                print(f"FAIL  import {module} loads {name}")
+                failures.append(f"import {module} loads {name}")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that the CLI entry points import within their time budgets.")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module (default: 5)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Multiply every budget by this factor, for slow machines (default: 1)")
+    args = parser.parse_args()
+
+    failures = check_startup(args.repeat, args.scale)
+    if failures:
+        print("\nStartup check failed:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nStartup check passed.")
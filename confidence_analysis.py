@@ -0,0 +1,203 @@
+import numpy as np
+import pandas as pd
+from confidence_bootstrap import DEFAULT_LEVEL, DEFAULT_SEED, bootstrap_intervals
+from confidence_engine import (CATEGORIES, HIGH_SCORE_CUTOFF, STRONG_MISCALIBRATION_CUTOFF,
+                               categorize_confidence_codes, category_column)
+
+# The in-memory analysis API: plain data in, labels and counts out. Nothing
+# here reads or writes files, draws or prints, so it can be called from ETL
+# jobs and notebooks; the CLI, the GUI and the service are layers on top.
+
+SCORE_COLUMNS = ('Quiz Score', 'Confidence Score')
+
+# Valid score range, inclusive
+SCORE_RANGE = (0, 100)
+
+REJECTION_COLUMN = 'Rejection Reason'
+
+# Bounds of the bootstrap confidence interval of each percentage in a summary
+CI_COLUMNS = ('CI Lower', 'CI Upper')
+
+class InvalidScoresError(ValueError):
+    """Raised when rows with invalid scores are not allowed (fail-fast validation)."""
+
+def validate_scores(df):
+    """
+    Check the score columns of every row in one vectorized pass.
+
+    Text score columns (see confidence_io.read_table's text_scores) are
+    converted to numbers first. A row is invalid if either score is
+    missing, not a number, or outside SCORE_RANGE. On clean numeric input
+    this is a few comparisons per row and the frame is returned as is.
+
+    Args:
+        df: DataFrame with 'Quiz Score' and 'Confidence Score' columns
+
+    Returns:
+        Tuple of (df with float64 score columns, rejected rows); the rejected
+        rows keep their original values plus a 'Rejection Reason' column,
+        and are None when every row is valid
+    """
+    low, high = SCORE_RANGE
+    original = df
+    scores = {}
+    not_numbers = {}
+    for col in SCORE_COLUMNS:
+        values = df[col]
+        if not pd.api.types.is_numeric_dtype(values):
+            numbers = pd.to_numeric(values, errors='coerce')
+            # Blank text counts as missing, anything else that didn't convert is not a number
+            not_numbers[col] = (numbers.isna() & values.notna() & (values.str.strip() != '')).values
+            values = numbers.astype(np.float64)
+        scores[col] = values.values
+    if not_numbers:
+        df = df.assign(**{col: scores[col] for col in not_numbers})
+
+    # NaN fails both comparisons, so this one test catches missing values too
+    valid = np.ones(len(df), dtype=bool)
+    for values in scores.values():
+        valid &= (values >= low) & (values <= high)
+    if valid.all():
+        return df, None
+
+    # Name the first problem of each invalid row
+    invalid = ~valid
+    conditions = []
+    reasons = []
+    for col, values in scores.items():
+        values = values[invalid]
+        not_number = not_numbers[col][invalid] if col in not_numbers else np.zeros(len(values), dtype=bool)
+        conditions += [not_number, np.isnan(values), (values < low) | (values > high)]
+        reasons += [f"{col} is not a number", f"{col} is missing", f"{col} is outside {low}-{high}"]
+    rejected = original.loc[invalid].assign(**{REJECTION_COLUMN: np.select(conditions, reasons, default='')})
+    return df, rejected
+
+def categorize_confidence(quiz_score, confidence_score, calibration_threshold=5):
+    """
+    Categorize one user based on their quiz score and confidence level.
+
+    Args:
+        quiz_score: The user's quiz score (0-100)
+        confidence_score: The user's confidence score (0-100)
+        calibration_threshold: The threshold (in percentage points) to determine if confidence is calibrated
+
+    Returns:
+        A string indicating the confidence category
+    """
+    code = categorize_confidence_codes(np.array([quiz_score], dtype=np.float64),
+                                       np.array([confidence_score], dtype=np.float64), calibration_threshold)
+    return CATEGORIES[code[0]]
+
+def summarize_counts(category_counts, bootstrap=0, ci_level=DEFAULT_LEVEL, seed=DEFAULT_SEED, workers=None):
+    """
+    Build the summary table from per-category counts.
+
+    Args:
+        category_counts: Array of counts indexed like CATEGORIES
+        bootstrap: If set, add confidence intervals of the percentages from
+            this many bootstrap resamples (see confidence_bootstrap)
+        ci_level: Confidence level of the intervals
+        seed: Seed of the bootstrap draws
+        workers: Processes to draw the resamples in (default: see bootstrap_intervals)
+
+    Returns:
+        DataFrame with 'Category', 'Count' and 'Percentage' columns, largest
+        first, plus 'CI Lower' and 'CI Upper' percentages with bootstrap
+    """
+    category_counts = np.asarray(category_counts)
+    total = category_counts.sum()
+    order = [code for code in np.argsort(-category_counts, kind='stable') if category_counts[code] > 0]
+    summary = pd.DataFrame({
+        'Category': [CATEGORIES[code] for code in order],
+        'Count': category_counts[order].astype(np.int64),
+    })
+    summary['Percentage'] = (summary['Count'] / total * 100).round(1)
+    if bootstrap:
+        lower, upper = bootstrap_intervals(category_counts, bootstrap, ci_level, seed, workers)
+        summary[CI_COLUMNS[0]] = lower[order].round(1)
+        summary[CI_COLUMNS[1]] = upper[order].round(1)
+    return summary
+
+class ConfidenceAnalysis:
+    """
+    Labels and counts of one analysis.
+
+    Attributes:
+        codes: int8 category code of every row (indexes into CATEGORIES)
+        counts: int64 number of rows per category, indexed like CATEGORIES
+        calibration_threshold, high_score_cutoff, strong_cutoff: The parameters used
+
+    Args:
+        codes: Category codes, e.g. from categorize_confidence_codes or ThresholdSweep.codes
+        calibration_threshold, high_score_cutoff, strong_cutoff: The parameters the codes were made with
+    """
+
+    def __init__(self, codes, calibration_threshold=5, high_score_cutoff=HIGH_SCORE_CUTOFF,
+                 strong_cutoff=STRONG_MISCALIBRATION_CUTOFF):
+        self.codes = np.asarray(codes)
+        self.counts = np.bincount(self.codes.reshape(-1), minlength=len(CATEGORIES)).astype(np.int64)
+        self.calibration_threshold = calibration_threshold
+        self.high_score_cutoff = high_score_cutoff
+        self.strong_cutoff = strong_cutoff
+
+    @property
+    def total(self):
+        """Number of rows analyzed."""
+        return int(self.counts.sum())
+
+    @property
+    def percentages(self):
+        """Share of the rows in each category in percent (unrounded), indexed like CATEGORIES."""
+        return self.counts / max(self.total, 1) * 100
+
+    @property
+    def labels(self):
+        """The categories as a pandas Categorical over CATEGORIES, one per row."""
+        return category_column(self.codes)
+
+    def summary(self, bootstrap=0, ci_level=DEFAULT_LEVEL, seed=DEFAULT_SEED):
+        """Summary table of the counts, with bootstrap intervals if `bootstrap` is set (see summarize_counts)."""
+        return summarize_counts(self.counts, bootstrap, ci_level, seed)
+
+    def labeled(self, df, column='Confidence Category'):
+        """Return a copy of `df` (with the rows that were analyzed) with the labels added as `column`."""
+        return df.assign(**{column: self.labels})
+
+def analyze_scores(quiz_scores, confidence_scores, calibration_threshold=5, high_score_cutoff=HIGH_SCORE_CUTOFF,
+                   strong_cutoff=STRONG_MISCALIBRATION_CUTOFF):
+    """
+    Categorize arrays of quiz and confidence scores.
+
+    Args:
+        quiz_scores: Array-like of quiz scores
+        confidence_scores: Array-like of confidence scores
+        calibration_threshold: The threshold (in percentage points) to determine if confidence is calibrated
+        high_score_cutoff: Quiz score from which a calibrated user "knows they know"
+        strong_cutoff: Difference beyond which miscalibration is "highly" rather than "moderately"
+
+    Returns:
+        A ConfidenceAnalysis
+    """
+    codes = categorize_confidence_codes(np.asarray(quiz_scores), np.asarray(confidence_scores),
+                                        calibration_threshold, high_score_cutoff, strong_cutoff)
+    return ConfidenceAnalysis(codes, calibration_threshold, high_score_cutoff, strong_cutoff)
+
+def analyze_frame(df, calibration_threshold=5, high_score_cutoff=HIGH_SCORE_CUTOFF,
+                  strong_cutoff=STRONG_MISCALIBRATION_CUTOFF):
+    """
+    Categorize the rows of a DataFrame with 'Quiz Score' and 'Confidence Score' columns.
+
+    The DataFrame is not modified; use ConfidenceAnalysis.labeled or
+    assign ConfidenceAnalysis.labels to add the categories to it.
+
+    Returns:
+        A ConfidenceAnalysis
+
+    Raises:
+        KeyError: If a score column is missing
+    """
+    for col in SCORE_COLUMNS:
+        if col not in df.columns:
+            raise KeyError(f"Missing required column '{col}'")
+    return analyze_scores(df['Quiz Score'].values, df['Confidence Score'].values, calibration_threshold,
+                          high_score_cutoff, strong_cutoff)
@@ -0,0 +1,70 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
+
+# Bootstrap confidence intervals for the category percentages. Resampling
+# the n users with replacement and counting their categories is the same as
+# drawing the counts from a multinomial over the observed shares, so every
+# resample is one draw per category, however many users there are.
+
+DEFAULT_RESAMPLES = 10000
+DEFAULT_LEVEL = 0.95
+DEFAULT_SEED = 0
+
+# Resamples drawn per block. Every block gets its own seed spawned from the
+# run's seed, so the intervals depend only on the seed, not on how the
+# blocks are spread over worker processes
+BLOCK_RESAMPLES = 50000
+
+# Below this many resamples the draws take less time than starting workers
+PARALLEL_MIN_RESAMPLES = 1000000
+
+def _draw_block(counts, size, seed):
+    """`size` resampled category counts (one row per resample) drawn from `counts`."""
+    total = counts.sum()
+    return np.random.default_rng(seed).multinomial(total, counts / max(total, 1), size=size)
+
+def bootstrap_intervals(counts, resamples=DEFAULT_RESAMPLES, level=DEFAULT_LEVEL, seed=DEFAULT_SEED, workers=None):
+    """
+    Percentile bootstrap confidence intervals of the share of each category.
+
+    Args:
+        counts: Number of users in each category
+        resamples: Number of bootstrap resamples
+        level: Confidence level of the intervals, e.g. 0.95
+        seed: Seed of the random draws; the same seed gives the same intervals
+        workers: Processes to draw the resamples in (default: one per CPU
+            from PARALLEL_MIN_RESAMPLES resamples on, otherwise 1)
+
+    Returns:
+        Tuple of (lower, upper) arrays of percentages, indexed like counts
+
+    Raises:
+        ValueError: If resamples is below 1 or level is not between 0 and 1
+    """
+    if resamples < 1:
+        raise ValueError("The number of bootstrap resamples must be at least 1")
+    if not 0 < level < 1:
+        raise ValueError("The confidence level must be between 0 and 1")
+
+    counts = np.asarray(counts, dtype=np.int64)
+    sizes = [BLOCK_RESAMPLES] * (resamples // BLOCK_RESAMPLES)
+    if resamples % BLOCK_RESAMPLES:
+        sizes.append(resamples % BLOCK_RESAMPLES)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if workers is None:
+        workers = (os.cpu_count() or 1) if resamples >= PARALLEL_MIN_RESAMPLES else 1
+    workers = min(workers, len(sizes))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            blocks = list(pool.map(_draw_block, repeat(counts), sizes, seeds))
+    else:
+        blocks = [_draw_block(counts, size, block_seed) for size, block_seed in zip(sizes, seeds)]
+
+    # Percentiles of the counts scale to percentiles of the percentages
+    tail = (1 - level) / 2 * 100
+    lower, upper = np.percentile(np.concatenate(blocks), [tail, 100 - tail], axis=0)
+    total = max(counts.sum(), 1)
+    return lower / total * 100, upper / total * 100
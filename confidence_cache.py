@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+
+# Bump when the outputs for the same input and parameters change, so old
+# entries stop matching
+CACHE_VERSION = 3
+
+DEFAULT_CACHE_DIR = os.environ.get('CONFIDENCE_CACHE_DIR') or os.path.join(
+    os.path.expanduser('~'), '.cache', 'confidence_analyzer')
+
+# Total size the cache is trimmed back to after each new entry
+DEFAULT_CACHE_MAX_MB = float(os.environ.get('CONFIDENCE_CACHE_MAX_MB', 1024))
+
+_HASH_BLOCK_SIZE = 1 << 20
+
+def file_digest(file_path, cache_dir=None):
+    """
+    SHA-256 of a file's content.
+
+    The digest is remembered per (path, size, modification time) in the
+    cache directory, so an unchanged file is only read once.
+
+    Args:
+        file_path: File to hash
+        cache_dir: Where remembered digests are kept (None to always hash)
+
+    Returns:
+        Hex digest string
+    """
+    memo_file = None
+    if cache_dir is not None:
+        stat = os.stat(file_path)
+        stamp = f"{os.path.abspath(file_path)}\0{stat.st_size}\0{stat.st_mtime_ns}"
+        memo_file = os.path.join(cache_dir, 'digests', hashlib.sha256(stamp.encode()).hexdigest())
+        try:
+            with open(memo_file) as f:
+                return f.read().strip()
+        except OSError:
+            pass
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    digest = digest.hexdigest()
+
+    if memo_file is not None:
+        os.makedirs(os.path.dirname(memo_file), exist_ok=True)
+        with open(memo_file, 'w') as f:
+            f.write(digest)
+    return digest
+
+class ResultCache:
+    """
+    On-disk cache of analysis outputs, keyed by input content and parameters.
+
+    Each entry is a directory of output files (results, summary, charts)
+    plus a meta.json naming them. Entries are written to a temporary
+    directory and renamed into place, so parallel runs never see half an
+    entry. When the cache grows past its size limit the least recently
+    used entries are removed.
+
+    Args:
+        cache_dir: Cache directory (default: CONFIDENCE_CACHE_DIR or ~/.cache/confidence_analyzer)
+        max_mb: Size limit in megabytes (default: CONFIDENCE_CACHE_MAX_MB or 1024)
+    """
+
+    def __init__(self, cache_dir=None, max_mb=None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = int((max_mb if max_mb is not None else DEFAULT_CACHE_MAX_MB) * 1024 * 1024)
+        self._entries_dir = os.path.join(self.cache_dir, 'entries')
+        os.makedirs(self._entries_dir, exist_ok=True)
+
+    def key(self, file_path, **params):
+        """
+        Cache key for analyzing `file_path` with the given parameters.
+
+        Returns:
+            Hex string combining the file's content hash, the parameters and CACHE_VERSION
+        """
+        params = dict(params, cache_version=CACHE_VERSION)
+        digest = hashlib.sha256(file_digest(file_path, self.cache_dir).encode())
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def lookup(self, key):
+        """
+        Find a cached entry and mark it as recently used.
+
+        Returns:
+            Dict of role -> cached file path, or None on a miss
+        """
+        entry_dir = os.path.join(self._entries_dir, key)
+        meta_file = os.path.join(entry_dir, 'meta.json')
+        try:
+            with open(meta_file) as f:
+                meta = json.load(f)
+            os.utime(meta_file)
+        except (OSError, ValueError):
+            return None
+        files = {role: os.path.join(entry_dir, name) for role, name in meta['files'].items()}
+        if not all(os.path.exists(path) for path in files.values()):
+            return None
+        return files
+
+    def store(self, key, files):
+        """
+        Add the output files of a run to the cache, then trim it to size.
+
+        Args:
+            key: Cache key (see key)
+            files: Dict of role -> path of the file to copy into the cache
+        """
+        entry_dir = os.path.join(self._entries_dir, key)
+        staging = tempfile.mkdtemp(prefix='.staging_', dir=self._entries_dir)
+        try:
+            names = {}
+            for role, path in files.items():
+                names[role] = f"{role}{os.path.splitext(path)[1]}"
+                shutil.copyfile(path, os.path.join(staging, names[role]))
+            with open(os.path.join(staging, 'meta.json'), 'w') as f:
+                json.dump({'files': names, 'created': time.time()}, f)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(staging, entry_dir)
+        except OSError:
+            # Another run stored the same entry first, or the disk is full; the cache is optional
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits its size limit."""
+        entries = []
+        total = 0
+        for name in os.listdir(self._entries_dir):
+            entry_dir = os.path.join(self._entries_dir, name)
+            try:
+                last_used = os.path.getmtime(os.path.join(entry_dir, 'meta.json'))
+                size = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+            except OSError:
+                continue  # Staging directory or an entry being removed
+            entries.append((last_used, size, entry_dir))
+            total += size
+
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """Remove every entry."""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self._entries_dir, exist_ok=True)
+
+def restore_files(cached, output_dir, names):
+    """
+    Copy cached files into an output directory.
+
+    Args:
+        cached: Dict of role -> cached file path (see ResultCache.lookup)
+        output_dir: Destination directory
+        names: Dict of role -> destination file name, for the roles to copy
+
+    Returns:
+        Dict of role -> destination path
+    """
+    restored = {}
+    for role, name in names.items():
+        restored[role] = os.path.join(output_dir, name)
+        shutil.copyfile(cached[role], restored[role])
+    return restored
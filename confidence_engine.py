@@ -0,0 +1,299 @@
+import numpy as np
+
+# Fixed category table. Category codes are indexes into this tuple.
+CATEGORIES = (
+    "Calibrated - Knows They Know",
+    "Calibrated - Knows They Don't Know",
+    "Moderately Overconfident",
+    "Highly Overconfident",
+    "Moderately Underconfident",
+    "Highly Underconfident",
+)
+
+_CATEGORY_LABELS = np.array(CATEGORIES, dtype=object)
+
+HIGH_SCORE_CUTOFF = 70  # Assuming 70% is a "high" score
+STRONG_MISCALIBRATION_CUTOFF = 20
+
+# Rows per block when labeling, so the temporaries stay small for huge inputs
+BLOCK_SIZE = 1 << 20
+
+# float32 holds about 7 significant digits, so scores up to 100 keep 5 decimals
+FLOAT32_SCORE_DECIMALS = 5
+
+def _widen(scores):
+    """
+    Convert scores to float64 for taking differences.
+
+    Scores read from files are already float64 and are used as they are.
+    float32 scores passed in by callers are rounded back to the decimal
+    values they were made from, so 70.1 - 65.1 compares against a
+    threshold exactly as it does in float64.
+    """
+    if scores.dtype == np.float32:
+        return np.round(scores.astype(np.float64), FLOAT32_SCORE_DECIMALS)
+    return scores.astype(np.float64, copy=False)
+
+def categorize_confidence_codes(quiz_scores, confidence_scores, calibration_threshold=5,
+                                high_score_cutoff=HIGH_SCORE_CUTOFF, strong_cutoff=STRONG_MISCALIBRATION_CUTOFF):
+    """
+    Categorize whole columns of quiz and confidence scores in one pass.
+
+    Gives the same result as calling categorize_confidence on every row,
+    including the boundary behavior (a difference exactly equal to the
+    threshold is calibrated, exactly 20 is moderate) and the handling of
+    missing values.
+
+    Args:
+        quiz_scores: Array-like of quiz scores
+        confidence_scores: Array-like of confidence scores
+        calibration_threshold: The threshold (in percentage points) to determine if confidence is calibrated
+        high_score_cutoff: Quiz score from which a calibrated user "knows they know"
+        strong_cutoff: Difference beyond which miscalibration is "highly" rather than "moderately"
+
+    Returns:
+        An int8 array of indexes into CATEGORIES
+    """
+    quiz_scores = np.asarray(quiz_scores)
+    confidence_scores = np.asarray(confidence_scores)
+    quiz_flat = quiz_scores.reshape(-1)
+    confidence_flat = confidence_scores.reshape(-1)
+
+    codes = np.empty(quiz_flat.shape, dtype=np.int8)
+    for start in range(0, len(codes), BLOCK_SIZE):
+        block = slice(start, start + BLOCK_SIZE)
+        codes[block] = _categorize_block(quiz_flat[block], confidence_flat[block], calibration_threshold,
+                                         high_score_cutoff, strong_cutoff)
+    return codes.reshape(quiz_scores.shape)
+
+def _categorize_block(quiz_scores, confidence_scores, calibration_threshold, high_score_cutoff, strong_cutoff):
+    # Differences are always taken in float64, whatever the storage dtype
+    quiz = _widen(quiz_scores)
+    diff = _widen(confidence_scores) - quiz
+
+    # Nested np.where mirrors the if/elif/else chain of categorize_confidence,
+    # so NaN differences fall through to the underconfident branch as before.
+    return np.where(
+        np.abs(diff) <= calibration_threshold,
+        np.where(quiz >= high_score_cutoff, 0, 1),
+        np.where(
+            diff > calibration_threshold,
+            np.where(diff > strong_cutoff, 3, 2),
+            np.where(diff < -strong_cutoff, 5, 4),
+        ),
+    )
+
+def categorize_confidence_array(quiz_scores, confidence_scores, calibration_threshold=5):
+    """
+    Vectorized version of categorize_confidence.
+
+    Args:
+        quiz_scores: Array-like of quiz scores
+        confidence_scores: Array-like of confidence scores
+        calibration_threshold: The threshold (in percentage points) to determine if confidence is calibrated
+
+    Returns:
+        An object array of confidence category strings
+    """
+    codes = categorize_confidence_codes(quiz_scores, confidence_scores, calibration_threshold)
+    return _CATEGORY_LABELS[codes]
+
+def category_column(codes):
+    """
+    Wrap category codes as a pandas Categorical over the fixed category table.
+
+    The column stores one int8 code per row instead of one string per row,
+    and writes out as the usual labels.
+    """
+    import pandas as pd
+    return pd.Categorical.from_codes(codes, categories=CATEGORIES)
+
+class ThresholdSweep:
+    """
+    Precomputed score differences for answering "what if the calibration
+    threshold were t?" without relabeling every row.
+
+    The differences are sorted once, so category counts for any threshold
+    are a handful of binary searches. Rows are also ordered by absolute
+    difference, so the rows that are calibrated at threshold t are always a
+    prefix of that order and the labels can be rebuilt from one boundary.
+    """
+
+    def __init__(self, quiz_scores, confidence_scores):
+        self.quiz_scores = np.asarray(quiz_scores)
+        self.confidence_scores = np.asarray(confidence_scores)
+        self.size = len(self.quiz_scores)
+
+        diff = _widen(self.confidence_scores) - _widen(self.quiz_scores)
+        abs_diff = np.abs(diff)
+        high = self.quiz_scores >= HIGH_SCORE_CUTOFF
+
+        # Sorted inputs for the count lookups (NaNs sort to the end and are
+        # never <= a threshold, matching the scalar categorizer)
+        self._high_abs_diff = np.sort(abs_diff[high])
+        self._low_abs_diff = np.sort(abs_diff[~high])
+        self._diff = np.sort(diff[~np.isnan(diff)])
+
+        # Row order by absolute difference, with the category each row gets
+        # when it is calibrated and when it is not. The second one does not
+        # depend on the threshold as long as it is at most the 20-point cutoff.
+        self.order = np.argsort(abs_diff, kind='stable')
+        if self.size < np.iinfo(np.int32).max:
+            self.order = self.order.astype(np.int32)
+        self.sorted_abs_diff = abs_diff[self.order]
+        self._calibrated_codes = np.where(high, 0, 1).astype(np.int8)
+        self._miscalibrated_codes = np.where(
+            diff > 0,
+            np.where(diff > STRONG_MISCALIBRATION_CUTOFF, 3, 2),
+            np.where(diff < -STRONG_MISCALIBRATION_CUTOFF, 5, 4),
+        ).astype(np.int8)
+
+    def boundary(self, calibration_threshold):
+        """Number of rows (in self.order) that are calibrated at the threshold."""
+        return int(np.searchsorted(self.sorted_abs_diff, calibration_threshold, side='right'))
+
+    def counts(self, calibration_threshold):
+        """
+        Category counts at the given threshold in O(log n).
+
+        Returns:
+            An int64 array of counts, indexed like CATEGORIES
+        """
+        t = calibration_threshold
+        strong = max(t, STRONG_MISCALIBRATION_CUTOFF)
+        n_diff = len(self._diff)
+
+        counts = np.zeros(len(CATEGORIES), dtype=np.int64)
+        counts[0] = np.searchsorted(self._high_abs_diff, t, side='right')
+        counts[1] = np.searchsorted(self._low_abs_diff, t, side='right')
+        counts[3] = n_diff - np.searchsorted(self._diff, strong, side='right')
+        counts[2] = n_diff - np.searchsorted(self._diff, t, side='right') - counts[3]
+        counts[5] = np.searchsorted(self._diff, -strong, side='left')
+        # Everything else, including rows with missing scores
+        counts[4] = self.size - counts.sum()
+        return counts
+
+    def codes(self, calibration_threshold):
+        """
+        Category codes for every row (in the original row order).
+
+        Returns:
+            An int8 array of indexes into CATEGORIES
+        """
+        if calibration_threshold > STRONG_MISCALIBRATION_CUTOFF:
+            return categorize_confidence_codes(self.quiz_scores, self.confidence_scores,
+                                               calibration_threshold)
+        calibrated = np.zeros(self.size, dtype=bool)
+        calibrated[self.order[:self.boundary(calibration_threshold)]] = True
+        return np.where(calibrated, self._calibrated_codes, self._miscalibrated_codes)
+
+    def labels(self, calibration_threshold):
+        """Category strings for every row (in the original row order)."""
+        return _CATEGORY_LABELS[self.codes(calibration_threshold)]
+
+def parameter_grid_counts(quiz_scores, confidence_scores, calibration_thresholds, high_score_cutoffs,
+                          strong_cutoffs):
+    """
+    Category counts for every combination of the three cutoffs, in one pass.
+
+    The differences are sorted once, so the over- and underconfident counts
+    for any threshold and strong cutoff are binary searches. For the
+    calibrated counts every row is binned by the smallest threshold that
+    calibrates it and by how many high-score cutoffs its quiz score
+    reaches; cumulative sums of that small 2-D histogram give the counts
+    for every (threshold, high-score cutoff) pair. Each combination counts
+    exactly what categorize_confidence_codes would label with it.
+
+    Args:
+        quiz_scores: Array-like of quiz scores
+        confidence_scores: Array-like of confidence scores
+        calibration_thresholds: Calibration thresholds to try
+        high_score_cutoffs: High-score cutoffs to try
+        strong_cutoffs: Strong-miscalibration cutoffs to try
+
+    Returns:
+        An int64 array of shape (thresholds, high-score cutoffs, strong
+        cutoffs, len(CATEGORIES)), in the order the values were given
+    """
+    thresholds = np.asarray(calibration_thresholds, dtype=np.float64).reshape(-1)
+    highs = np.asarray(high_score_cutoffs, dtype=np.float64).reshape(-1)
+    strongs = np.asarray(strong_cutoffs, dtype=np.float64).reshape(-1)
+    quiz = _widen(np.asarray(quiz_scores).reshape(-1))
+    diff = _widen(np.asarray(confidence_scores).reshape(-1)) - quiz
+    n = len(diff)
+
+    # Calibrated rows: bin by (first sorted threshold with |diff| <= t, cutoffs reached)
+    t_order = np.argsort(thresholds, kind='stable')
+    h_order = np.argsort(highs, kind='stable')
+    first = np.searchsorted(thresholds[t_order], np.abs(diff), side='left')  # NaN: never calibrated
+    reached = np.searchsorted(highs[h_order], quiz, side='right')
+    reached[np.isnan(quiz)] = 0
+    width = len(highs) + 1
+    hist = np.bincount(first * width + reached, minlength=(len(thresholds) + 1) * width)
+    calibrated = hist.reshape(len(thresholds) + 1, width)[:-1].cumsum(axis=0)
+    # at_least[:, k]: calibrated rows whose quiz score reaches at least k cutoffs
+    at_least = calibrated[:, ::-1].cumsum(axis=1)[:, ::-1]
+    t_rank = np.argsort(t_order)
+    h_rank = np.argsort(h_order)
+    knows = at_least[:, 1:][np.ix_(t_rank, h_rank)]
+    calibrated_total = at_least[:, 0][t_rank]
+
+    # Miscalibrated rows: counts above / below a value are binary searches in the sorted differences
+    sorted_diff = np.sort(diff[~np.isnan(diff)])
+    strong = np.maximum(thresholds[:, None], strongs[None, :])
+    over = len(sorted_diff) - np.searchsorted(sorted_diff, thresholds, side='right')
+    highly_over = len(sorted_diff) - np.searchsorted(sorted_diff, strong, side='right')
+    highly_under = np.searchsorted(sorted_diff, -strong, side='left')
+
+    counts = np.zeros((len(thresholds), len(highs), len(strongs), len(CATEGORIES)), dtype=np.int64)
+    counts[..., 0] = knows[:, :, None]
+    counts[..., 1] = (calibrated_total[:, None] - knows)[:, :, None]
+    counts[..., 2] = (over[:, None] - highly_over)[:, None, :]
+    counts[..., 3] = highly_over[:, None, :]
+    counts[..., 5] = highly_under[:, None, :]
+    # Everything else, including rows with missing scores
+    counts[..., 4] = n - counts.sum(axis=-1)
+    return counts
+
+# Density grid: one cell per whole percentage point, centered on 0..100
+DENSITY_BINS = 101
+
+def category_histograms(quiz_scores, confidence_scores, codes, bins=DENSITY_BINS):
+    """
+    Count users per category on a fixed (quiz, confidence) grid over 0-100.
+
+    The grid does not depend on the data, so histograms of separate chunks
+    or shards can simply be added together. Scores outside 0-100 land in
+    the edge cells and rows with missing scores are left out.
+
+    Args:
+        quiz_scores: Array-like of quiz scores
+        confidence_scores: Array-like of confidence scores
+        codes: Category codes of the rows (see categorize_confidence_codes)
+        bins: Number of cells along each axis
+
+    Returns:
+        An int64 array of shape (len(CATEGORIES), bins, bins) indexed by
+        [category, quiz cell, confidence cell]
+    """
+    quiz = _widen(np.asarray(quiz_scores))
+    confidence = _widen(np.asarray(confidence_scores))
+    valid = ~(np.isnan(quiz) | np.isnan(confidence))
+    scale = (bins - 1) / 100
+
+    quiz_cell = np.clip(np.rint(quiz[valid] * scale), 0, bins - 1).astype(np.int64)
+    confidence_cell = np.clip(np.rint(confidence[valid] * scale), 0, bins - 1).astype(np.int64)
+    flat = (np.asarray(codes)[valid].astype(np.int64) * bins + quiz_cell) * bins + confidence_cell
+    counts = np.bincount(flat, minlength=len(CATEGORIES) * bins * bins)
+    return counts.reshape(len(CATEGORIES), bins, bins)
+
+def grid_cell_codes(calibration_threshold=5, bins=DENSITY_BINS):
+    """
+    Category code of every cell center of the density grid.
+
+    Returns:
+        An int8 array of shape (bins, bins) indexed by [quiz cell, confidence cell]
+    """
+    centers = np.linspace(0, 100, bins)
+    quiz, confidence = np.meshgrid(centers, centers, indexing='ij')
+    return categorize_confidence_codes(quiz, confidence, calibration_threshold)
@@ -0,0 +1,189 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from matplotlib import cm
+from matplotlib.artist import setp
+from matplotlib.figure import Figure
+from confidence_engine import category_histograms
+from confidence_plots import draw_category_density, draw_scores, use_density
+
+# Figures are built on their own Figure objects rather than through pyplot,
+# so they can be drawn in any thread or process without sharing global state.
+
+def scatter_data(quiz_scores, confidence_scores, codes, render_mode='auto'):
+    """
+    Pick the data a scatter plot job needs.
+
+    When the plot will be a density grid only the small per-category
+    histograms are sent to the renderer, not every row.
+
+    Returns:
+        Keyword arguments for scatter_figure / render_scatter
+    """
+    if use_density(len(codes), render_mode):
+        return {'histograms': category_histograms(quiz_scores, confidence_scores, codes)}
+    return {'quiz_scores': np.asarray(quiz_scores), 'confidence_scores': np.asarray(confidence_scores),
+            'codes': np.asarray(codes)}
+
+def scatter_figure(categories, calibration_threshold=5, quiz_scores=None, confidence_scores=None, codes=None,
+                   histograms=None, figsize=(10, 8)):
+    """
+    Build the quiz vs. confidence scatter plot.
+
+    Args:
+        categories: Category labels to draw, in legend order
+        calibration_threshold: Threshold drawn as the dotted lines around perfect calibration
+        quiz_scores, confidence_scores, codes: Per-user data, drawn as one marker per user
+        histograms: Per-category density grid (see category_histograms), drawn instead of markers
+        figsize: Figure size in inches
+
+    Returns:
+        A matplotlib Figure
+    """
+    fig = Figure(figsize=figsize)
+    ax = fig.add_subplot(111)
+    colors = cm.tab10(np.linspace(0, 1, len(categories)))
+    if histograms is not None:
+        draw_category_density(ax, histograms, categories, colors)
+    else:
+        draw_scores(ax, quiz_scores, confidence_scores, codes, categories, colors, 'scatter')
+
+    t = calibration_threshold
+    ax.plot([0, 100], [0, 100], 'k--', label='Perfect Calibration')
+    ax.plot([0, 100], [t, 100 + t], 'r:', label=f'+{t}% Threshold')
+    ax.plot([0, 100], [-t, 100 - t], 'r:', label=f'-{t}% Threshold')
+
+    ax.set_xlabel('Quiz Score (%)')
+    ax.set_ylabel('Confidence Score (%)')
+    ax.set_title('Quiz Score vs Confidence Analysis')
+    ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+def distribution_figure(categories, counts, annotate=False, figsize=(12, 6), title=None, intervals=None):
+    """
+    Build the bar chart of the confidence category distribution.
+
+    Args:
+        categories: Category labels
+        counts: Number of users in each category
+        annotate: Write the count above each bar
+        figsize: Figure size in inches
+        title: Chart title (default: 'Distribution of Confidence Categories')
+        intervals: (lower, upper) bounds of each count, drawn as error bars
+
+    Returns:
+        A matplotlib Figure
+    """
+    counts = np.asarray(counts)
+    order = np.argsort(-counts, kind='stable')
+    categories = [categories[i] for i in order]
+    counts = counts[order]
+    errors = None
+    if intervals is not None:
+        lower, upper = (np.asarray(bound, dtype=np.float64)[order] for bound in intervals)
+        errors = np.clip([counts - lower, upper - counts], 0, None)
+
+    fig = Figure(figsize=figsize)
+    ax = fig.add_subplot(111)
+    colors = cm.tab10(np.linspace(0, 1, len(categories)))
+    bars = ax.bar(categories, counts, color=colors, yerr=errors, capsize=4)
+    if annotate:
+        for bar in bars:
+            height = bar.get_height()
+            ax.annotate(f'{height}',
+                        xy=(bar.get_x() + bar.get_width() / 2, height),
+                        xytext=(0, 3),
+                        textcoords="offset points",
+                        ha='center', va='bottom')
+
+    ax.set_xlabel('Confidence Category')
+    ax.set_ylabel('Number of Users')
+    ax.set_title(title or 'Distribution of Confidence Categories')
+    setp(ax.get_xticklabels(), rotation=45, ha='right')
+    fig.tight_layout()
+    return fig
+
+def save_figure(fig, file_path, dpi=None, tight=False):
+    """Save a Figure as an image; `tight` crops it to its contents like bbox_inches='tight'."""
+    fig.savefig(file_path, dpi=dpi or 'figure', bbox_inches='tight' if tight else None)
+    return file_path
+
+def render_scatter(file_path, categories, calibration_threshold=5, dpi=None, tight=False, **data):
+    """Build and save the scatter plot (a job for FigureRenderer). `data` comes from scatter_data."""
+    return save_figure(scatter_figure(categories, calibration_threshold, **data), file_path, dpi, tight)
+
+def render_distribution(file_path, categories, counts, annotate=False, figsize=(12, 6), dpi=None, tight=False,
+                        title=None, intervals=None):
+    """Build and save the distribution bar chart (a job for FigureRenderer)."""
+    return save_figure(distribution_figure(categories, counts, annotate, figsize, title, intervals), file_path, dpi,
+                       tight)
+
+class FigureRenderer:
+    """
+    Render figures in worker processes while the caller carries on.
+
+    Jobs are functions that take the output path as their first argument
+    and save one figure there. With workers=0 the jobs run in the calling
+    process instead, when their results are collected with completed(), so
+    the caller still gets to report its other results first. Use that on
+    single-core machines or when the caller is already a pool worker.
+
+    Workers are started with 'spawn', so they are safe to create from a
+    process that runs threads or a GUI.
+    """
+
+    def __init__(self, workers=2):
+        self._pool = None
+        if workers:
+            self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        self._futures = {}
+        self._pending = []
+
+    def submit(self, func, file_path, *args, **kwargs):
+        """Queue a job that saves a figure to `file_path`."""
+        if self._pool is not None:
+            self._futures[self._pool.submit(func, file_path, *args, **kwargs)] = file_path
+        else:
+            self._pending.append((func, file_path, args, kwargs))
+
+    def completed(self):
+        """
+        Wait for the submitted jobs.
+
+        Yields:
+            (file_path, error) for each job as it finishes; error is None
+            on success and the exception raised by the job otherwise
+        """
+        while self._pending:
+            func, file_path, args, kwargs = self._pending.pop(0)
+            try:
+                func(file_path, *args, **kwargs)
+            except Exception as e:
+                yield file_path, e
+            else:
+                yield file_path, None
+
+        for future in as_completed(list(self._futures)):
+            file_path = self._futures.pop(future, None)
+            if file_path is None:  # dropped by cancel()
+                continue
+            yield file_path, future.exception()
+
+    def cancel(self):
+        """Drop the jobs that haven't started; figures already being drawn are still saved."""
+        self._pending = []
+        for future in self._futures:
+            future.cancel()
+        self._futures = {}
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,289 @@
+import os
+import sys
+import sqlite3
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from confidence_engine import CATEGORIES
+
+# An optional local SQLite database of past runs. Every recorded run adds its
+# labeled rows and category counts, indexed by user name and run time, so
+# questions like "how has this user's calibration changed over the term?" are
+# answered from the index instead of re-reading every old results file.
+#
+# The rows are stored in a table clustered by (user name, run), which is its
+# own index: a user's rows across all runs sit together on disk, and a run is
+# inserted in name order, so adding a run costs one B-tree insert per row
+# instead of a table insert plus an index insert.
+
+# Rows inserted per executemany call when recording a run
+INSERT_ROWS = 100000
+
+# Time a writer waits for another process's transaction to finish, in seconds
+BUSY_TIMEOUT = 60
+
+RESULT_COLUMNS = ['User Name', 'Quiz Score', 'Confidence Score', 'Confidence Category']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS categories (
+    code INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    run_time TEXT NOT NULL,
+    input_file TEXT NOT NULL,
+    results_file TEXT,
+    calibration_threshold REAL NOT NULL,
+    rows INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS run_categories (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    category INTEGER NOT NULL REFERENCES categories (code),
+    count INTEGER NOT NULL,
+    PRIMARY KEY (run_id, category)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS run_users (
+    user_name TEXT NOT NULL,
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    row INTEGER NOT NULL,
+    quiz_score REAL,
+    confidence_score REAL,
+    category INTEGER REFERENCES categories (code),
+    PRIMARY KEY (user_name, run_id, row)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS runs_by_time ON runs (run_time);
+"""
+
+def _category_codes(labels):
+    """Codes into CATEGORIES of a column of category labels (-1 for anything else)."""
+    if isinstance(labels.dtype, pd.CategoricalDtype) and tuple(labels.cat.categories) == CATEGORIES:
+        return labels.cat.codes.values
+    return pd.Categorical(labels, categories=CATEGORIES).codes
+
+def _names(values):
+    """User names as an array of strings ('' for missing names, which can't be part of the key)."""
+    return values.astype(object).where(values.notna(), '').astype(str).values
+
+class RunHistory:
+    """
+    SQLite database of analysis runs.
+
+    Runs are stored in three tables: `runs` (one row per run), `run_categories`
+    (its category counts) and `run_users` (its labeled rows, keyed by user
+    name, run and row number within the run). Categories are stored as codes
+    into CATEGORIES; the `categories` table names them for ad-hoc SQL queries.
+
+    Args:
+        db_file: Path to the database file; it is created if it doesn't exist
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        directory = os.path.dirname(os.path.abspath(db_file))
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(db_file, timeout=BUSY_TIMEOUT)
+        with self.connection:
+            self.connection.executescript(_SCHEMA)
+            self.connection.executemany("INSERT OR IGNORE INTO categories VALUES (?, ?)", enumerate(CATEGORIES))
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record_run(self, input_file, calibration_threshold, chunks, results_file=None, run_time=None):
+        """
+        Add a run and its labeled rows in one transaction.
+
+        Args:
+            input_file: The file that was analyzed
+            calibration_threshold: The threshold the rows were labeled with
+            chunks: Iterable of DataFrames with the labeled rows ('User Name',
+                'Quiz Score', 'Confidence Score' and 'Confidence Category')
+            results_file: The run's results file, if any
+            run_time: When the run happened (default: now)
+
+        Returns:
+            The run's id
+        """
+        run_time = (run_time or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+        counts = np.zeros(len(CATEGORIES), dtype=np.int64)
+        rows = 0
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (run_time, input_file, results_file, calibration_threshold, rows) "
+                "VALUES (?, ?, ?, ?, 0)",
+                (run_time, os.path.abspath(input_file), results_file and os.path.abspath(results_file),
+                 float(calibration_threshold)))
+            run_id = cursor.lastrowid
+            for chunk in chunks:
+                codes = _category_codes(chunk['Confidence Category'])
+                counts += np.bincount(codes[codes >= 0], minlength=len(CATEGORIES))
+                names = _names(chunk['User Name'])
+                quiz = chunk['Quiz Score'].to_numpy(np.float64)
+                confidence = chunk['Confidence Score'].to_numpy(np.float64)
+                categories = np.where(codes >= 0, codes, None)
+                # Inserted in name order, so consecutive rows land on the same pages
+                order = np.argsort(names, kind='stable')
+                for start in range(0, len(order), INSERT_ROWS):
+                    part = order[start:start + INSERT_ROWS]
+                    # SQLite stores NaN scores as NULL
+                    self.connection.executemany(
+                        "INSERT INTO run_users VALUES (?, ?, ?, ?, ?, ?)",
+                        zip(names[part].tolist(), [run_id] * len(part), (part + rows).tolist(), quiz[part].tolist(),
+                            confidence[part].tolist(), categories[part].tolist()))
+                rows += len(chunk)
+            self.connection.executemany(
+                "INSERT INTO run_categories VALUES (?, ?, ?)",
+                [(run_id, code, int(count)) for code, count in enumerate(counts) if count])
+            self.connection.execute("UPDATE runs SET rows = ? WHERE run_id = ?", (rows, run_id))
+        return run_id
+
+    def runs(self):
+        """
+        Every recorded run, oldest first.
+
+        Returns:
+            DataFrame with 'Run', 'Run Time', 'Input File', 'Results File',
+            'Calibration Threshold' and 'Rows' columns
+        """
+        return self._query(
+            "SELECT run_id, run_time, input_file, results_file, calibration_threshold, rows FROM runs "
+            "ORDER BY run_time, run_id",
+            (), ['Run', 'Run Time', 'Input File', 'Results File', 'Calibration Threshold', 'Rows'])
+
+    def user_trajectory(self, user_name):
+        """
+        One user's scores and category in every run they appear in, oldest first.
+
+        Returns:
+            DataFrame with 'Run', 'Run Time', 'Input File', 'Quiz Score',
+            'Confidence Score' and 'Confidence Category' columns
+        """
+        return self._query(
+            "SELECT r.run_id, r.run_time, r.input_file, u.quiz_score, u.confidence_score, c.name "
+            "FROM run_users u JOIN runs r ON r.run_id = u.run_id LEFT JOIN categories c ON c.code = u.category "
+            "WHERE u.user_name = ? ORDER BY r.run_time, r.run_id, u.row",
+            (user_name,), ['Run', 'Run Time', 'Input File', 'Quiz Score', 'Confidence Score', 'Confidence Category'])
+
+    def category_trends(self, since=None, until=None):
+        """
+        Category counts and percentages of every run, oldest first.
+
+        Args:
+            since, until: Only runs at or after / at or before this time
+                ('YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS')
+
+        Returns:
+            DataFrame with 'Run', 'Run Time', 'Input File', 'Category',
+            'Count' and 'Percentage' (of the run) columns
+        """
+        conditions = []
+        params = []
+        if since is not None:
+            conditions.append("r.run_time >= ?")
+            params.append(since)
+        if until is not None:
+            # A date alone includes the whole day
+            conditions.append("r.run_time <= ?")
+            params.append(until if len(until) > 10 else f"{until} 23:59:59")
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        trends = self._query(
+            "SELECT r.run_id, r.run_time, r.input_file, c.name, rc.count, 100.0 * rc.count / r.rows "
+            "FROM run_categories rc JOIN runs r ON r.run_id = rc.run_id JOIN categories c ON c.code = rc.category "
+            f"{where}ORDER BY r.run_time, r.run_id, rc.count DESC",
+            params, ['Run', 'Run Time', 'Input File', 'Category', 'Count', 'Percentage'])
+        trends['Percentage'] = trends['Percentage'].round(1)
+        return trends
+
+    def _query(self, sql, params, columns):
+        return pd.DataFrame(self.connection.execute(sql, params).fetchall(), columns=columns)
+
+def record_results_file(db_file, results_file, input_file=None, calibration_threshold=5, chunksize=INSERT_ROWS,
+                        run_time=None):
+    """
+    Record a run from its results file (confidence_analysis_results_*), reading it in chunks.
+
+    Args:
+        db_file: History database file
+        results_file: Results file with the labeled rows
+        input_file: The file that was analyzed (default: the results file)
+        calibration_threshold: The threshold the rows were labeled with
+        chunksize: Rows read at a time
+        run_time: When the run happened (default: now)
+
+    Returns:
+        The run's id
+    """
+    from confidence_io import iter_table_chunks
+
+    with RunHistory(db_file) as history:
+        return history.record_run(input_file or results_file, calibration_threshold,
+                                  iter_table_chunks(results_file, chunksize, columns=RESULT_COLUMNS),
+                                  results_file, run_time)
+
+def _file_run_time(results_file):
+    """Run time of an existing results file: the timestamp in its name, or else its modification time."""
+    stem = os.path.splitext(os.path.basename(results_file))[0]
+    try:
+        return datetime.strptime(stem[-15:], "%Y%m%d_%H%M%S")
+    except ValueError:
+        return datetime.fromtimestamp(os.path.getmtime(results_file))
+
+def _print_table(df, output_file):
+    if output_file:
+        from confidence_io import write_table
+        write_table(df, output_file)
+        print(f"{len(df)} rows saved to {output_file}")
+    elif df.empty:
+        print("No matching runs.")
+    else:
+        print(df.to_string(index=False))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the history of recorded analysis runs.")
+    parser.add_argument("db_file", help="History database (as given to analyze_confidence.py --history)")
+    parser.add_argument("--output", default=None,
+                        help="Save the result to a CSV, Parquet or Feather file instead of printing it")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("runs", help="List the recorded runs")
+    user = commands.add_parser("user", help="One user's scores and category across runs")
+    user.add_argument("user_name", help="The user's 'User Name'")
+    trends = commands.add_parser("trends", help="Category counts and percentages per run")
+    trends.add_argument("--since", default=None, help="Only runs from this date on (YYYY-MM-DD)")
+    trends.add_argument("--until", default=None, help="Only runs up to this date (YYYY-MM-DD)")
+    add = commands.add_parser("import", help="Record existing confidence_analysis_results_* files as runs")
+    add.add_argument("results_files", nargs="+", help="Results files to record")
+    add.add_argument("--threshold", type=float, default=5,
+                     help="Calibration threshold the files were labeled with (default: 5)")
+    args = parser.parse_args()
+
+    if args.command != "import" and not os.path.exists(args.db_file):
+        print(f"Error: History database {args.db_file} does not exist.")
+        sys.exit(1)
+
+    try:
+        if args.command == "import":
+            for results_file in args.results_files:
+                run_id = record_results_file(args.db_file, results_file, calibration_threshold=args.threshold,
+                                             run_time=_file_run_time(results_file))
+                print(f"Recorded {results_file} as run {run_id}")
+            sys.exit(0)
+
+        with RunHistory(args.db_file) as history:
+            if args.command == "runs":
+                result = history.runs()
+            elif args.command == "user":
+                result = history.user_trajectory(args.user_name)
+            else:
+                result = history.category_trends(args.since, args.until)
+        _print_table(result, args.output)
+    except (sqlite3.Error, OSError, KeyError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
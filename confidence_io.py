@@ -0,0 +1,292 @@
+import importlib.util
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+REQUIRED_COLUMNS = ['User Name', 'Quiz Score', 'Confidence Score']
+
+# Explicit dtypes for the columns the analysis reads, so pandas doesn't have
+# to infer them and every chunk of a streamed file gets the same types.
+# Scores are float64 (NaN for missing), so they are categorized and written
+# back exactly as they were read; user names are categorical, since the same
+# users appear across many quiz attempts.
+COLUMN_DTYPES = {
+    'User Name': 'category',
+    'Quiz Score': 'float64',
+    'Confidence Score': 'float64',
+}
+
+# Streamed chunks keep plain string names: each chunk would get its own
+# category table, which Arrow IPC files can't hold
+CHUNK_COLUMN_DTYPES = dict(COLUMN_DTYPES, **{'User Name': str})
+
+FORMATS = ('csv', 'parquet', 'feather')
+
+EXTENSIONS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.feather': 'feather',
+    '.arrow': 'feather',
+    '.ipc': 'feather',
+}
+
+HAVE_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+def detect_format(file_path, fmt=None):
+    """
+    Work out the table format of a file.
+
+    Args:
+        file_path: Path to the file
+        fmt: Explicit format ('csv', 'parquet' or 'feather'); overrides the extension
+
+    Returns:
+        The format name (unknown extensions are read as CSV)
+    """
+    if fmt is not None:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format '{fmt}', expected one of {', '.join(FORMATS)}")
+        return fmt
+    extension = os.path.splitext(file_path)[1].lower()
+    return EXTENSIONS.get(extension, 'csv')
+
+def _require_pyarrow(fmt):
+    if not HAVE_PYARROW:
+        raise ImportError(f"Reading and writing {fmt} files requires pyarrow. Install it with: pip install pyarrow")
+
+SCORE_COLUMNS = ['Quiz Score', 'Confidence Score']
+
+def column_dtypes(columns=None, chunked=False, text_scores=False):
+    """
+    Explicit dtypes for the analysis columns among `columns` (all of them by default).
+
+    With text_scores the score columns are read as text, so values that are
+    not numbers reach the validation instead of failing the read.
+    """
+    dtypes = CHUNK_COLUMN_DTYPES if chunked else COLUMN_DTYPES
+    if text_scores:
+        dtypes = dict(dtypes, **{col: str for col in SCORE_COLUMNS})
+    return {col: dtype for col, dtype in dtypes.items() if columns is None or col in columns}
+
+def _csv_options(columns, chunked=False, text_scores=False, text_columns=()):
+    dtypes = dict(column_dtypes(columns, chunked, text_scores), **{col: str for col in text_columns})
+    return {'usecols': columns, 'dtype': dtypes}
+
+def _compact(df, chunked=False, text_scores=False):
+    """Cast the analysis columns of a frame read from Parquet/Feather to the compact dtypes."""
+    dtypes = column_dtypes(df.columns, chunked)
+    if text_scores:
+        # Left as stored; the validation converts them and reports what doesn't convert
+        dtypes = {col: dtype for col, dtype in dtypes.items() if col not in SCORE_COLUMNS}
+    return df.astype(dtypes)
+
+def read_columns(file_path, fmt=None):
+    """Return the column names of a table file without reading its rows."""
+    fmt = detect_format(file_path, fmt)
+    if fmt == 'csv':
+        return list(pd.read_csv(file_path, nrows=0).columns)
+
+    _require_pyarrow(fmt)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(file_path).names)
+    import pyarrow as pa
+    with pa.memory_map(file_path) as source:
+        return list(pa.ipc.open_file(source).schema.names)
+
+def read_table(file_path, fmt=None, columns=None, text_scores=False, text_columns=()):
+    """
+    Read a CSV, Parquet or Feather file into a DataFrame.
+
+    CSV files are read with explicit dtypes for the analysis columns, and
+    with the pyarrow engine when it is installed.
+
+    Args:
+        file_path: Path to the file
+        fmt: Explicit format; by default it is chosen from the extension
+        columns: If given, only read these columns
+        text_scores: Read the score columns as text (see column_dtypes)
+        text_columns: Other CSV columns to read as text instead of guessing their type
+
+    Returns:
+        DataFrame with the file contents
+    """
+    fmt = detect_format(file_path, fmt)
+    if fmt == 'csv':
+        engine = 'pyarrow' if HAVE_PYARROW else 'c'
+        return pd.read_csv(file_path, engine=engine,
+                           **_csv_options(columns, text_scores=text_scores, text_columns=text_columns))
+
+    _require_pyarrow(fmt)
+    if fmt == 'parquet':
+        return _compact(pd.read_parquet(file_path, columns=columns), text_scores=text_scores)
+    return _compact(pd.read_feather(file_path, columns=columns), text_scores=text_scores)
+
+def iter_table_chunks(file_path, chunksize, fmt=None, columns=None, text_scores=False, text_columns=()):
+    """
+    Read a table file in chunks of at most `chunksize` rows.
+
+    Arguments are as for read_table. Give columns whose type pandas would
+    guess as text_columns, or each chunk may get a different type.
+
+    Yields:
+        DataFrames with consecutive rows of the file
+    """
+    fmt = detect_format(file_path, fmt)
+    if fmt == 'csv':
+        # The pyarrow CSV engine does not support chunked reads
+        with pd.read_csv(file_path, chunksize=chunksize,
+                         **_csv_options(columns, chunked=True, text_scores=text_scores,
+                                        text_columns=text_columns)) as reader:
+            yield from reader
+        return
+
+    _require_pyarrow(fmt)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunksize, columns=columns):
+            yield _compact(batch.to_pandas(), chunked=True, text_scores=text_scores)
+        return
+
+    import pyarrow.feather as feather
+    table = feather.read_table(file_path, columns=columns, memory_map=True)
+    for batch in table.to_batches(max_chunksize=chunksize):
+        yield _compact(batch.to_pandas(), chunked=True, text_scores=text_scores)
+
+def with_text_score_fallback(open_chunks):
+    """
+    Yield chunks read with numeric score columns, switching to text score columns if a score isn't a number.
+
+    Reading with numeric dtypes fails at the first value that isn't a
+    number. The data is then reopened with text score columns (see
+    column_dtypes) and continues after the rows already yielded, so the
+    caller sees every row exactly once and the validation can report the
+    bad values. Clean data never pays for the text read.
+
+    Args:
+        open_chunks: Function taking text_scores and returning an iterator
+            of chunks from the start of the data
+
+    Yields:
+        DataFrames with consecutive rows of the data
+    """
+    done = 0
+    try:
+        for chunk in open_chunks(False):
+            yield chunk
+            done += len(chunk)
+        return
+    except ValueError:
+        pass
+
+    for chunk in open_chunks(True):
+        if done >= len(chunk):
+            done -= len(chunk)
+            continue
+        if done:
+            chunk = chunk.iloc[done:]
+            done = 0
+        yield chunk
+
+def _csv_scores(df):
+    """
+    The frame with its score columns ready to be written as CSV text.
+
+    Scores are read as floats, so a whole-number score such as 85 would be
+    written as 85.0. Whole values are written as integers instead, and other
+    values as before. Each value is converted on its own, so the text doesn't
+    depend on how the rows were chunked or sharded.
+    """
+    scores = {}
+    for col in SCORE_COLUMNS:
+        if col not in df.columns or df[col].dtype.kind != 'f':
+            continue
+        values = df[col].to_numpy()
+        with np.errstate(invalid='ignore'):
+            whole = (values == np.round(values)) & (np.abs(values) < 2 ** 53)
+        if whole.all():
+            scores[col] = values.astype(np.int64)
+        elif whole.any():
+            text = values.astype(str).astype(object)
+            text[whole] = values[whole].astype(np.int64).astype(str)
+            text[np.isnan(values)] = None
+            scores[col] = text
+    return df.assign(**scores) if scores else df
+
+def write_table(df, file_path, fmt=None):
+    """Write a DataFrame as CSV, Parquet or Feather (chosen from the extension by default)."""
+    fmt = detect_format(file_path, fmt)
+    if fmt == 'csv':
+        _csv_scores(df).to_csv(file_path, index=False)
+        return
+
+    _require_pyarrow(fmt)
+    if fmt == 'parquet':
+        df.to_parquet(file_path, index=False)
+    else:
+        df.reset_index(drop=True).to_feather(file_path)
+
+class TableWriter:
+    """
+    Append DataFrame chunks to one CSV, Parquet or Feather file.
+
+    The first chunk fixes the columns and types of the file; later chunks
+    are converted to the same schema. With append=True an existing CSV
+    file is extended without writing another header.
+    """
+
+    def __init__(self, file_path, fmt=None, header=True, append=False):
+        self.file_path = file_path
+        self.fmt = detect_format(file_path, fmt)
+        self._header = header and not append
+        self._file = None
+        self._writer = None
+        self._schema = None
+        if self.fmt == 'csv':
+            self._file = open(file_path, 'a' if append else 'w', newline='')
+        elif append:
+            raise ValueError(f"Appending is only supported for CSV files, not {self.fmt}")
+        else:
+            _require_pyarrow(self.fmt)
+
+    def write(self, df):
+        """Append a chunk of rows."""
+        if self.fmt == 'csv':
+            _csv_scores(df).to_csv(self._file, header=self._header, index=False)
+            self._header = False
+            return
+
+        import pyarrow as pa
+        table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        if self._writer is None:
+            self._schema = table.schema
+            if self.fmt == 'parquet':
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(self.file_path, self._schema)
+            else:
+                self._writer = pa.ipc.new_file(self.file_path, self._schema)
+        self._writer.write_table(table)
+
+    def append_csv_rows(self, file_path):
+        """Append the rows of a headerless CSV file as they are (CSV files only)."""
+        with open(file_path, 'r', newline='') as f:
+            shutil.copyfileobj(f, self._file)
+        self._header = False
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def output_path(output_dir, stem, fmt='csv'):
+    """Path of an output table with the file extension of its format."""
+    return os.path.join(output_dir, f"{stem}.{fmt}")
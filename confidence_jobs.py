@@ -0,0 +1,68 @@
+import threading
+from contextlib import contextmanager
+from confidence_profile import StageProfiler
+
+# Rows per progress step in stages that can be split up, such as writing
+# the results table; small enough that Cancel takes effect quickly
+STEP_ROWS = 100000
+
+class JobCancelled(Exception):
+    """Raised inside a job at the first stage or step after it was cancelled."""
+
+class AnalysisJob:
+    """
+    Progress and cancellation of an analysis running in a worker thread.
+
+    The work is split into named stages that get equal parts of the
+    progress bar. The worker wraps each stage in `with job.stage(name):`
+    and calls job.step() between parts of long stages; both raise
+    JobCancelled once cancel() was called, so the job stops at the next
+    boundary and can clean up. on_progress is called from the worker
+    thread, so GUI callers pass it on to their event loop.
+
+    Args:
+        stages: Names of the stages in the order they run
+        on_progress: Called with (fraction done from 0 to 1, stage name)
+        profiler: StageProfiler that also times each stage
+    """
+
+    def __init__(self, stages, on_progress=None, profiler=None):
+        self.stages = list(stages)
+        self.on_progress = on_progress
+        self.profiler = profiler or StageProfiler(enabled=False)
+        self.current = None
+        self._index = 0
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Ask the job to stop; safe to call from any thread."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def check(self):
+        """Raise JobCancelled if the job was cancelled."""
+        if self.cancelled:
+            raise JobCancelled()
+
+    @contextmanager
+    def stage(self, name):
+        """Run the body of the with-block as the stage `name` (timed by the profiler)."""
+        self.check()
+        self._index = self.stages.index(name)
+        self.current = name
+        self._report(0)
+        with self.profiler.stage(name):
+            yield
+        self._report(1)
+
+    def step(self, fraction):
+        """Report that `fraction` of the current stage is done, and stop here if the job was cancelled."""
+        self._report(fraction)
+        self.check()
+
+    def _report(self, fraction):
+        if self.on_progress is not None:
+            self.on_progress((self._index + fraction) / len(self.stages), self.current)
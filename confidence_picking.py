@@ -0,0 +1,220 @@
+import numpy as np
+
+# Finding the user under the mouse in a scatter plot. PointIndex buckets the
+# points into a uniform grid once per dataset, so a lookup only compares the
+# points in the few cells around the cursor instead of every point;
+# ScatterPicker wires it to hover tooltips, click selection and a lasso.
+
+# Width of a grid cell in score points. Scores are mostly whole numbers, so
+# one cell per point keeps the buckets small without making many empty ones
+CELL_SIZE = 1.0
+
+# How close (in pixels) the mouse must be to a point to pick it
+PICK_RADIUS_PIXELS = 6
+
+# At most this many selected points are outlined; larger selections are still exported in full
+HIGHLIGHT_MAX_POINTS = 10000
+
+class PointIndex:
+    """
+    Grid index of (x, y) points for nearest-point and region lookups.
+
+    The points are sorted by grid cell once. Every column of cells is then a
+    run of consecutive entries, so any box of cells is a handful of slices.
+    Points outside [low, high] are kept in the edge cells and points with a
+    missing coordinate are left out.
+
+    Args:
+        x, y: Arrays of coordinates (e.g. quiz and confidence scores)
+        cell_size: Width of a grid cell
+        low, high: Range the grid covers on both axes
+    """
+
+    def __init__(self, x, y, cell_size=CELL_SIZE, low=0.0, high=100.0):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.cell_size = cell_size
+        self.low = low
+        self.high = high
+        self.cells = int((high - low) // cell_size) + 1
+
+        points = np.flatnonzero(~(np.isnan(self.x) | np.isnan(self.y)))
+        keys = self._cell(self.x[points]) * self.cells + self._cell(self.y[points])
+        order = np.argsort(keys, kind='stable')
+        self.order = points[order]
+        self.starts = np.searchsorted(keys[order], np.arange(self.cells * self.cells + 1))
+
+    def __len__(self):
+        return len(self.x)
+
+    def _cell(self, values):
+        return np.clip(((np.asarray(values) - self.low) // self.cell_size).astype(np.int64), 0, self.cells - 1)
+
+    def _candidates(self, x0, x1, y0, y1):
+        """Indexes of the points in the cells overlapping the box (a superset of the points in it)."""
+        (ix0, ix1), (iy0, iy1) = self._cell([x0, x1]), self._cell([y0, y1])
+        columns = np.arange(ix0, ix1 + 1) * self.cells
+        runs = zip(self.starts[columns + iy0], self.starts[columns + iy1 + 1])
+        parts = [self.order[begin:end] for begin, end in runs if end > begin]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.intp)
+
+    def near(self, x, y, radius_x, radius_y=None):
+        """
+        Points within an ellipse around (x, y), nearest first.
+
+        Distances are measured in units of the radii, so radii that match a
+        number of pixels on each axis give the on-screen nearest point.
+
+        Returns:
+            Array of point indexes (empty if none are close enough)
+        """
+        radius_y = radius_x if radius_y is None else radius_y
+        candidates = self._candidates(x - radius_x, x + radius_x, y - radius_y, y + radius_y)
+        distance = ((self.x[candidates] - x) / radius_x) ** 2 + ((self.y[candidates] - y) / radius_y) ** 2
+        inside = distance <= 1
+        candidates, distance = candidates[inside], distance[inside]
+        return candidates[np.argsort(distance, kind='stable')]
+
+    def nearest(self, x, y, radius_x, radius_y=None):
+        """Index of the point nearest to (x, y) within the radii (see near), or -1."""
+        found = self.near(x, y, radius_x, radius_y)
+        return int(found[0]) if len(found) else -1
+
+    def in_box(self, x0, x1, y0, y1):
+        """Sorted indexes of the points with x0 <= x <= x1 and y0 <= y <= y1."""
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        candidates = self._candidates(x0, x1, y0, y1)
+        x, y = self.x[candidates], self.y[candidates]
+        return np.sort(candidates[(x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)])
+
+    def in_polygon(self, vertices):
+        """Sorted indexes of the points inside a polygon given as a sequence of (x, y) vertices."""
+        from matplotlib.path import Path
+
+        vertices = np.asarray(vertices, dtype=np.float64)
+        if len(vertices) < 3:
+            return np.empty(0, dtype=np.intp)
+        (x0, y0), (x1, y1) = vertices.min(axis=0), vertices.max(axis=0)
+        candidates = self.in_box(x0, x1, y0, y1)
+        inside = Path(vertices).contains_points(np.column_stack((self.x[candidates], self.y[candidates])))
+        return candidates[inside]
+
+class ScatterPicker:
+    """
+    Hover tooltips, click selection and lasso selection on a scatter plot's axes.
+
+    Hovering shows describe(point, others) next to the nearest point, where
+    `others` is how many more points are under the cursor (users with the
+    same scores overlap exactly). Clicking selects the nearest point, or
+    clears the selection on empty space; dragging draws a lasso that
+    selects every point inside it. Nothing reacts while a toolbar zoom or
+    pan mode is active.
+
+    By default the tooltip and selection outline are animated artists that
+    the picker blits itself. A figure that manages its own redrawing (e.g.
+    blits its own animated artists) passes a `redraw` function instead and
+    draws `artists` along with its own.
+
+    Args:
+        ax: Axes the points are drawn on
+        index: PointIndex of the points
+        describe: Function (point index, others) -> tooltip text
+        on_select: Called with the sorted array of selected point indexes whenever the selection changes
+        redraw: Function that redraws the animated artists (default: the picker blits them)
+    """
+
+    def __init__(self, ax, index, describe, on_select=None, redraw=None):
+        from matplotlib.widgets import LassoSelector
+
+        self.ax = ax
+        self.index = index
+        self.describe = describe
+        self.on_select = on_select
+        self.selected = np.empty(0, dtype=np.intp)
+        self.tooltip = ax.annotate('', xy=(0, 0), xytext=(12, 12), textcoords='offset points', visible=False,
+                                   bbox={'boxstyle': 'round', 'fc': 'lightyellow', 'alpha': 0.9},
+                                   zorder=10, animated=redraw is None)
+        self.highlight, = ax.plot([], [], 'o', markerfacecolor='none', markeredgecolor='black',
+                                  markeredgewidth=1.5, markersize=9, zorder=9, animated=redraw is None,
+                                  label='_nolegend_')
+        self.artists = [self.highlight, self.tooltip]
+        self._hovered = -1
+        self._background = None
+        self._redraw = redraw or self._blit
+
+        canvas = ax.figure.canvas
+        self._connections = [
+            canvas.mpl_connect('motion_notify_event', self._on_move),
+            canvas.mpl_connect('button_press_event', self._on_click),
+        ]
+        if redraw is None:
+            self._connections.append(canvas.mpl_connect('draw_event', self._on_draw))
+        self.lasso = LassoSelector(ax, self._on_lasso, useblit=True)
+
+    def disconnect(self):
+        """Stop reacting to the mouse (e.g. before the axes are cleared)."""
+        for connection in self._connections:
+            self.ax.figure.canvas.mpl_disconnect(connection)
+        self._connections = []
+        self.lasso.disconnect_events()
+
+    def _busy(self, event):
+        return event.inaxes is not self.ax or not self.ax.figure.canvas.widgetlock.available(self.lasso)
+
+    def _radii(self, event):
+        """Data-space radii of PICK_RADIUS_PIXELS around the mouse."""
+        to_data = self.ax.transData.inverted()
+        (x0, y0), (x1, y1) = to_data.transform([(event.x - PICK_RADIUS_PIXELS, event.y - PICK_RADIUS_PIXELS),
+                                                (event.x + PICK_RADIUS_PIXELS, event.y + PICK_RADIUS_PIXELS)])
+        return abs(x1 - x0) / 2, abs(y1 - y0) / 2
+
+    def _on_move(self, event):
+        found = np.empty(0, dtype=np.intp)
+        if not self._busy(event) and event.xdata is not None:
+            found = self.index.near(event.xdata, event.ydata, *self._radii(event))
+        point = int(found[0]) if len(found) else -1
+        if point == self._hovered:
+            return
+        self._hovered = point
+        if point >= 0:
+            self.tooltip.xy = (self.index.x[point], self.index.y[point])
+            self.tooltip.set_text(self.describe(point, len(found) - 1))
+        self.tooltip.set_visible(point >= 0)
+        self._redraw()
+
+    def _on_click(self, event):
+        if self._busy(event) or event.button != 1 or event.xdata is None:
+            return
+        point = self.index.nearest(event.xdata, event.ydata, *self._radii(event))
+        self.select(np.array([point] if point >= 0 else [], dtype=np.intp))
+
+    def _on_lasso(self, vertices):
+        # A click also ends as a (degenerate) lasso; it was handled by _on_click
+        if len(vertices) >= 3:
+            self.select(self.index.in_polygon(vertices))
+
+    def select(self, points):
+        """Select the given point indexes and outline them."""
+        self.selected = np.asarray(points, dtype=np.intp)
+        shown = self.selected[:HIGHLIGHT_MAX_POINTS]
+        self.highlight.set_data(self.index.x[shown], self.index.y[shown])
+        self._redraw()
+        if self.on_select is not None:
+            self.on_select(self.selected)
+
+    def _on_draw(self, event):
+        canvas = self.ax.figure.canvas
+        self._background = canvas.copy_from_bbox(self.ax.figure.bbox)
+        for artist in self.artists:
+            self.ax.draw_artist(artist)
+
+    def _blit(self):
+        canvas = self.ax.figure.canvas
+        if self._background is None:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self._background)
+        for artist in self.artists:
+            self.ax.draw_artist(artist)
+        canvas.blit(self.ax.figure.bbox)
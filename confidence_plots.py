@@ -0,0 +1,118 @@
+import numpy as np
+from confidence_engine import CATEGORIES, category_histograms
+
+# Above this many users a scatter plot is slow and turns into a solid blob
+DENSITY_MIN_POINTS = 100000
+
+RENDER_MODES = ('auto', 'scatter', 'density')
+
+def use_density(n_points, render_mode='auto'):
+    """
+    Decide whether to draw a density grid instead of one marker per user.
+
+    Args:
+        n_points: Number of users to plot
+        render_mode: 'scatter', 'density', or 'auto' to switch on DENSITY_MIN_POINTS
+
+    Returns:
+        True if the density grid should be drawn
+    """
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"Unknown render mode '{render_mode}', expected one of {', '.join(RENDER_MODES)}")
+    if render_mode == 'auto':
+        return n_points >= DENSITY_MIN_POINTS
+    return render_mode == 'density'
+
+def category_colors(categories, colors):
+    """
+    Spread per-category colors into an array indexed by category code.
+
+    Args:
+        categories: Category labels in the order the colors were assigned
+        colors: One RGBA color per entry of `categories`
+
+    Returns:
+        A (len(CATEGORIES), 4) array; categories not listed are transparent
+    """
+    code_colors = np.zeros((len(CATEGORIES), 4))
+    for category, color in zip(categories, colors):
+        code_colors[CATEGORIES.index(category)] = color
+    return code_colors
+
+def density_image(counts, cell_codes, code_colors):
+    """
+    Turn a density grid into an RGBA image.
+
+    Each cell is colored by its category and its opacity grows with the log
+    of the number of users in it, so sparse and dense regions both stay
+    visible. Empty cells are transparent.
+
+    Args:
+        counts: (bins, bins) number of users per [quiz cell, confidence cell]
+        cell_codes: (bins, bins) category code to color each cell with
+        code_colors: (len(CATEGORIES), 4) colors indexed by category code
+
+    Returns:
+        A (bins, bins, 4) image with confidence along the rows, for imshow(origin='lower')
+    """
+    image = code_colors[cell_codes].copy()
+    peak = np.log1p(counts.max()) if counts.max() > 0 else 1.0
+    image[..., 3] = np.where(counts > 0, 0.25 + 0.75 * np.log1p(counts) / peak, 0.0)
+    return image.transpose(1, 0, 2)
+
+def draw_density(ax, counts, cell_codes, code_colors):
+    """
+    Draw a density grid on the axes.
+
+    Returns:
+        The AxesImage, so callers can update it later with set_data
+    """
+    bins = counts.shape[0]
+    half_cell = 50 / (bins - 1)
+    return ax.imshow(density_image(counts, cell_codes, code_colors), origin='lower',
+                     extent=(-half_cell, 100 + half_cell, -half_cell, 100 + half_cell),
+                     interpolation='nearest', aspect='auto', zorder=1)
+
+def draw_category_density(ax, histograms, categories, colors):
+    """
+    Draw per-category histograms (see category_histograms) as a density grid.
+
+    Each cell takes the color of the category with the most users in it.
+    An empty, labeled marker is added per category so legends still list them.
+
+    Args:
+        ax: Matplotlib axes to draw on
+        histograms: (len(CATEGORIES), bins, bins) counts
+        categories: Category labels to show, in legend order
+        colors: One color per entry of `categories`
+
+    Returns:
+        The AxesImage
+    """
+    image = draw_density(ax, histograms.sum(axis=0), histograms.argmax(axis=0),
+                         category_colors(categories, colors))
+    for category, color in zip(categories, colors):
+        ax.scatter([], [], color=color, label=category)
+    return image
+
+def draw_scores(ax, quiz_scores, confidence_scores, codes, categories, colors, render_mode='auto'):
+    """
+    Draw users on the quiz vs. confidence axes, as markers or as a density grid.
+
+    Args:
+        ax: Matplotlib axes to draw on
+        quiz_scores: Array of quiz scores
+        confidence_scores: Array of confidence scores
+        codes: Category code of each user
+        categories: Category labels to draw, in legend order
+        colors: One color per entry of `categories`
+        render_mode: 'auto', 'scatter' or 'density' (see use_density)
+    """
+    if use_density(len(codes), render_mode):
+        histograms = category_histograms(quiz_scores, confidence_scores, codes)
+        draw_category_density(ax, histograms, categories, colors)
+        return
+
+    for category, color in zip(categories, colors):
+        mask = codes == CATEGORIES.index(category)
+        ax.scatter(quiz_scores[mask], confidence_scores[mask], label=category, color=color, alpha=0.7)
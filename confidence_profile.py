@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import time
+import platform
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def _max_rss_mb():
+    """High-water mark of the process's resident memory in MB, or None where unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _child_cpu_seconds():
+    """CPU time used by finished child processes (always 0 on Windows)."""
+    times = os.times()
+    return times.children_user + times.children_system
+
+class StageProfiler:
+    """
+    Record wall time, CPU time and peak memory for each stage of an analysis.
+
+    Wrap each stage in `with profiler.stage(name):`. A disabled profiler
+    records nothing, so callers can always go through one.
+
+    Memory is always reported as the process's resident high-water mark
+    when the stage ended and how much the stage raised it. With
+    trace_memory, the peak of the allocations made during the stage is
+    also measured with tracemalloc (numpy and pandas buffers included);
+    that is exact per stage but slows down stages that make many small
+    Python objects, such as CSV writing.
+
+    Args:
+        enabled: Whether to record anything
+        cprofile_stage: Name of a stage to also run under cProfile
+        trace_memory: Also measure per-stage peak allocations with tracemalloc
+    """
+
+    def __init__(self, enabled=True, cprofile_stage=None, trace_memory=False):
+        self.enabled = enabled
+        self.cprofile_stage = cprofile_stage
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.stats = None
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the body of the with-block as the stage `name`."""
+        if not self.enabled:
+            yield
+            return
+
+        rss_before = _max_rss_mb()
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+
+        profile = None
+        if name == self.cprofile_stage:
+            import cProfile
+            profile = cProfile.Profile()
+            profile.enable()
+
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        child_cpu = _child_cpu_seconds()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            child_cpu = _child_cpu_seconds() - child_cpu
+            if profile is not None:
+                profile.disable()
+                import pstats
+                self.stats = pstats.Stats(profile)
+            record = {
+                'stage': name,
+                'wall_seconds': round(wall, 6),
+                'cpu_seconds': round(cpu, 6),
+            }
+            if child_cpu > 0:
+                # Worker processes that finished during the stage (e.g. --workers shards)
+                record['child_cpu_seconds'] = round(child_cpu, 6)
+            if self.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                if started_tracing:
+                    tracemalloc.stop()
+                record['peak_memory_mb'] = round((peak - base) / (1024 * 1024), 3)
+            rss_after = _max_rss_mb()
+            if rss_after is not None:
+                record['max_rss_mb'] = round(rss_after, 1)
+                record['max_rss_growth_mb'] = round(rss_after - rss_before, 1)
+            self.stages.append(record)
+
+    def report(self, **context):
+        """
+        Build the report as a JSON-ready dict.
+
+        Args:
+            **context: Extra fields describing the run (input file, threshold, ...)
+        """
+        return {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            **context,
+            'memory_tracing': self.trace_memory,
+            'total_wall_seconds': round(time.perf_counter() - self._started, 6),
+            'stages': self.stages,
+        }
+
+    def write(self, output_dir, timestamp, **context):
+        """
+        Write the JSON report (and the cProfile dump, if one was taken) next to the outputs.
+
+        Returns:
+            Path of the JSON report, or None if profiling is disabled
+        """
+        if not self.enabled:
+            return None
+        report_file = os.path.join(output_dir, f"confidence_analysis_profile_{timestamp}.json")
+        with open(report_file, 'w') as f:
+            json.dump(self.report(**context), f, indent=2)
+        if self.stats is not None:
+            self.stats.dump_stats(os.path.join(output_dir, f"confidence_analysis_{self.cprofile_stage}_{timestamp}.prof"))
+        return report_file
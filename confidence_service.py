@@ -0,0 +1,356 @@
+import io
+import os
+import sys
+import json
+import zlib
+import signal
+import asyncio
+import argparse
+import contextlib
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+
+# The service process only parses requests and routes them; pandas, the
+# engine and matplotlib are loaded once in each worker process.
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_SERVICE_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+# Datasets each worker keeps in memory, least recently used dropped first
+DEFAULT_MAX_DATASETS = 4
+
+MAX_BODY_BYTES = 1 << 20
+
+class RequestError(Exception):
+    """A request the service can't handle; reported to the client with its HTTP status."""
+
+    def __init__(self, message, status=HTTPStatus.BAD_REQUEST):
+        super().__init__(message)
+        self.status = status
+
+    def __reduce__(self):
+        # Keep the status when the error is raised in a worker process
+        return RequestError, (str(self), self.status)
+
+# ---------------------------------------------------------------------------
+# Worker side: runs in the pool processes
+
+_datasets = OrderedDict()
+_max_datasets = DEFAULT_MAX_DATASETS
+
+def _init_worker(max_datasets):
+    """Pool initializer: import the analysis modules once, before the first request."""
+    global _max_datasets
+    _max_datasets = max_datasets
+    import analyze_confidence  # noqa: F401  (pandas, numpy, the engine and the I/O layer)
+
+def _ping():
+    return os.getpid()
+
+def _dataset(file_path):
+    """
+    The ThresholdSweep of a file, loaded on first use and kept while the file is unchanged.
+
+    Rows with missing, non-numeric or out-of-range scores are left out.
+
+    Returns:
+        Tuple of (ThresholdSweep, number of rows left out)
+
+    Raises:
+        RequestError: If the file is missing or lacks a required column
+    """
+    from confidence_engine import ThresholdSweep
+    from confidence_io import REQUIRED_COLUMNS, read_columns
+    from confidence_analysis import validate_scores
+    from analyze_confidence import read_scores_table
+
+    try:
+        stat = os.stat(file_path)
+    except OSError as e:
+        raise RequestError(f"Cannot read {file_path}: {e.strerror}", HTTPStatus.NOT_FOUND)
+    key = (file_path, stat.st_size, stat.st_mtime_ns)
+    dataset = _datasets.get(key)
+    if dataset is not None:
+        _datasets.move_to_end(key)
+        return dataset
+
+    # Drop older versions of the same file along with the least recently used datasets
+    for old in [old for old in _datasets if old[0] == file_path]:
+        del _datasets[old]
+    missing = [col for col in REQUIRED_COLUMNS if col not in read_columns(file_path)]
+    if missing:
+        raise RequestError(f"Missing required column '{missing[0]}' in the input file.")
+    df, rejected = validate_scores(read_scores_table(file_path, columns=['Quiz Score', 'Confidence Score']))
+    if rejected is not None:
+        df = df.drop(index=rejected.index)
+    dataset = (ThresholdSweep(df['Quiz Score'].values, df['Confidence Score'].values),
+               0 if rejected is None else len(rejected))
+    _datasets[key] = dataset
+    while len(_datasets) > _max_datasets:
+        _datasets.popitem(last=False)
+    return dataset
+
+def _summary_records(category_counts):
+    from confidence_analysis import summarize_counts
+    return summarize_counts(category_counts).to_dict('records')
+
+def summary_job(file_path, calibration_threshold):
+    """Worker: category summary of a dataset at one threshold."""
+    sweep, rejected = _dataset(file_path)
+    return {'rows': sweep.size, 'rejected_rows': rejected, 'calibration_threshold': calibration_threshold,
+            'summary': _summary_records(sweep.counts(calibration_threshold))}
+
+def threshold_job(file_path, thresholds):
+    """Worker: category counts of a dataset at each of several thresholds."""
+    from confidence_engine import CATEGORIES
+
+    sweep, rejected = _dataset(file_path)
+    return {
+        'rows': sweep.size,
+        'rejected_rows': rejected,
+        'categories': list(CATEGORIES),
+        'counts': [{'calibration_threshold': t, 'counts': sweep.counts(t).tolist()} for t in thresholds],
+    }
+
+def analyze_job(file_path, output_dir, calibration_threshold, options):
+    """Worker: a full analysis that writes the usual output files."""
+    from analyze_confidence import analyze_confidence_data
+
+    # Charts are drawn in this worker; it is already one of the service's processes
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        result = analyze_confidence_data(file_path, output_dir, calibration_threshold, render_workers=0,
+                                         **options)
+    if result is None:
+        raise RequestError(log.getvalue().strip() or "Analysis failed")
+    if 'Confidence Category' in result:
+        # In-memory runs return the labeled rows; reply with the counts only
+        from confidence_analysis import ConfidenceAnalysis
+        summary = ConfidenceAnalysis(result['Confidence Category'].cat.codes.values).summary().to_dict('records')
+    else:
+        summary = result.to_dict('records')
+    return {'output_dir': output_dir or os.path.dirname(file_path), 'summary': summary, 'log': log.getvalue()}
+
+# ---------------------------------------------------------------------------
+# Service side: the asyncio HTTP front end
+
+class WorkerPool:
+    """
+    Worker processes, each with its own dataset cache.
+
+    Requests about the same file always go to the same worker, so each
+    dataset is loaded into one process only and stays warm there, while
+    requests about different files run in parallel.
+
+    Args:
+        workers: Number of worker processes
+        max_datasets: Datasets each worker keeps in memory
+    """
+
+    def __init__(self, workers=DEFAULT_SERVICE_WORKERS, max_datasets=DEFAULT_MAX_DATASETS):
+        context = multiprocessing.get_context('spawn')
+        self._executors = [
+            ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_init_worker,
+                                initargs=(max_datasets,))
+            for _ in range(workers)
+        ]
+
+    def __len__(self):
+        return len(self._executors)
+
+    def warm_up(self):
+        """Start every worker and wait until its imports are done."""
+        for executor in self._executors:
+            executor.submit(_ping).result()
+
+    async def run(self, file_path, func, *args):
+        """Run `func(file_path, *args)` in the worker that owns `file_path`."""
+        executor = self._executors[zlib.crc32(file_path.encode()) % len(self._executors)]
+        return await asyncio.get_running_loop().run_in_executor(executor, func, file_path, *args)
+
+    def close(self):
+        for executor in self._executors:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+def _field(payload, name, kind, default=None, required=False):
+    """Read and type-check one field of a JSON request body."""
+    if name not in payload:
+        if required:
+            raise RequestError(f"Missing field '{name}'")
+        return default
+    value = payload[name]
+    if kind is float and isinstance(value, int) and not isinstance(value, bool):
+        value = float(value)
+    if not isinstance(value, kind) or isinstance(value, bool) and kind is not bool:
+        raise RequestError(f"Field '{name}' must be of type {kind.__name__}")
+    return value
+
+def _threshold(value):
+    return int(value) if float(value).is_integer() else float(value)
+
+async def handle_request(pool, method, path, payload):
+    """
+    Dispatch one request.
+
+    Endpoints (all take and return JSON):
+        GET  /health     Worker count
+        POST /summary    {file_path, calibration_threshold=5}: category summary
+        POST /threshold  {file_path, thresholds: [...]}: category counts per threshold
+        POST /analyze    {file_path, output_dir=None, calibration_threshold=5, plots=True,
+                          output_format=None, render_mode='auto', on_invalid='reject'}: full analysis
+                         with output files
+
+    Returns:
+        JSON-ready response dict
+
+    Raises:
+        RequestError: For unknown endpoints and invalid requests
+    """
+    if path == '/health':
+        if method != 'GET':
+            raise RequestError("Use GET /health", HTTPStatus.METHOD_NOT_ALLOWED)
+        return {'status': 'ok', 'workers': len(pool)}
+
+    if path not in ('/summary', '/threshold', '/analyze'):
+        raise RequestError(f"Unknown endpoint {path}", HTTPStatus.NOT_FOUND)
+    if method != 'POST':
+        raise RequestError(f"Use POST {path}", HTTPStatus.METHOD_NOT_ALLOWED)
+
+    # Paths are made absolute so every spelling of a file maps to one cached dataset
+    file_path = os.path.abspath(_field(payload, 'file_path', str, required=True))
+    if path == '/summary':
+        t = _threshold(_field(payload, 'calibration_threshold', float, 5))
+        return await pool.run(file_path, summary_job, t)
+    if path == '/threshold':
+        thresholds = _field(payload, 'thresholds', list, required=True)
+        if not thresholds or not all(isinstance(t, (int, float)) and not isinstance(t, bool) for t in thresholds):
+            raise RequestError("Field 'thresholds' must be a non-empty list of numbers")
+        return await pool.run(file_path, threshold_job, [_threshold(t) for t in thresholds])
+
+    output_dir = _field(payload, 'output_dir', str)
+    options = {
+        'plots': _field(payload, 'plots', bool, True),
+        'output_format': _field(payload, 'output_format', str),
+        'render_mode': _field(payload, 'render_mode', str, 'auto'),
+        'on_invalid': _field(payload, 'on_invalid', str, 'reject'),
+    }
+    if options['on_invalid'] not in ('reject', 'fail', 'keep'):
+        raise RequestError("Field 'on_invalid' must be 'reject', 'fail' or 'keep'")
+    if options['output_format'] not in (None, 'csv', 'parquet', 'feather'):
+        raise RequestError("Field 'output_format' must be 'csv', 'parquet' or 'feather'")
+    if options['render_mode'] not in ('auto', 'scatter', 'density'):
+        raise RequestError("Field 'render_mode' must be 'auto', 'scatter' or 'density'")
+    t = _threshold(_field(payload, 'calibration_threshold', float, 5))
+    return await pool.run(file_path, analyze_job, output_dir and os.path.abspath(output_dir), t, options)
+
+async def _read_request(reader):
+    """
+    Read one HTTP/1.1 request.
+
+    Returns:
+        (method, path, headers, body), or None when the client closed the connection
+    """
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    try:
+        method, target, _ = request_line.decode('latin-1').split()
+    except ValueError:
+        raise RequestError("Malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length') or 0)
+    if length > MAX_BODY_BYTES:
+        raise RequestError("Request body too large", HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+    body = await reader.readexactly(length) if length else b''
+    return method, target.split('?', 1)[0], headers, body
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+async def _serve_connection(pool, reader, writer):
+    """Answer requests on one connection until the client closes it or asks to."""
+    try:
+        while True:
+            keep_alive = False
+            try:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                try:
+                    payload = json.loads(body) if body else {}
+                except ValueError:
+                    raise RequestError("Request body is not valid JSON")
+                if not isinstance(payload, dict):
+                    raise RequestError("Request body must be a JSON object")
+                status, result = HTTPStatus.OK, await handle_request(pool, method, path, payload)
+            except RequestError as e:
+                status, result = e.status, {'error': str(e)}
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            except Exception as e:
+                status, result = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f"{type(e).__name__}: {e}"}
+            writer.write(_response(status, result, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    finally:
+        writer.close()
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=DEFAULT_SERVICE_WORKERS,
+                max_datasets=DEFAULT_MAX_DATASETS):
+    """
+    Run the analysis service until it is cancelled.
+
+    Args:
+        host: Interface to listen on (default: localhost only)
+        port: TCP port
+        workers: Number of worker processes
+        max_datasets: Datasets each worker keeps in memory
+    """
+    loop = asyncio.get_running_loop()
+    with contextlib.suppress(NotImplementedError):  # Windows
+        # Stop like on Ctrl+C, so the worker processes are shut down cleanly
+        loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+
+    pool = WorkerPool(workers, max_datasets)
+    try:
+        await loop.run_in_executor(None, pool.warm_up)
+        server = await asyncio.start_server(lambda r, w: _serve_connection(pool, r, w), host, port)
+        print(f"Confidence analysis service listening on http://{host}:{port} with {workers} workers", flush=True)
+        async with server:
+            await server.serve_forever()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        pool.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve quiz score vs. confidence analyses over local HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Interface to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"TCP port (default: {DEFAULT_PORT})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_SERVICE_WORKERS,
+                        help=f"Worker processes (default: {DEFAULT_SERVICE_WORKERS})")
+    parser.add_argument("--max-datasets", type=int, default=DEFAULT_MAX_DATASETS,
+                        help=f"Datasets each worker keeps in memory (default: {DEFAULT_MAX_DATASETS})")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_datasets))
+    except KeyboardInterrupt:
+        sys.exit(0)
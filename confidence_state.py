@@ -0,0 +1,96 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+# Bump when the state layout or the meaning of the saved counts changes, so
+# old state files trigger a full run
+STATE_VERSION = 1
+
+# Bytes hashed at the start of the input and just before the saved offset
+# to recognize a file that was rewritten rather than appended to
+FINGERPRINT_BYTES = 1 << 16
+
+def input_fingerprint(file_path, offset):
+    """
+    Fingerprint of the first `offset` bytes of a file.
+
+    Hashes the head of the file and the bytes just before `offset`, so
+    appending rows leaves it unchanged while rewriting or truncating the
+    already processed part changes it.
+
+    Returns:
+        Dict with the offset and the two hex digests
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(min(offset, FINGERPRINT_BYTES))
+        tail_start = max(0, offset - FINGERPRINT_BYTES)
+        f.seek(tail_start)
+        tail = f.read(offset - tail_start)
+    return {
+        'offset': offset,
+        'head_sha256': hashlib.sha256(head).hexdigest(),
+        'tail_sha256': hashlib.sha256(tail).hexdigest(),
+    }
+
+def complete_lines_end(file_path, start):
+    """
+    Offset just past the last line break of a file, and at least `start`.
+
+    A row that is still being written has no line break yet, so it is left
+    for the next run.
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        end = size
+        while end > start:
+            block_start = max(start, end - FINGERPRINT_BYTES)
+            f.seek(block_start)
+            newline = f.read(end - block_start).rfind(b'\n')
+            if newline >= 0:
+                return block_start + newline + 1
+            end = block_start
+    return start
+
+def state_paths(output_dir, stem):
+    """Paths of the JSON state file and the arrays saved next to it."""
+    base = os.path.join(output_dir, f"confidence_analysis_state_{stem}")
+    return base + '.json', base + '.npz'
+
+def load_state(output_dir, stem):
+    """
+    Load the state saved by the last incremental run.
+
+    Returns:
+        Tuple of (state dict, category counts, density histograms), or None
+        if there is no usable state
+    """
+    state_file, arrays_file = state_paths(output_dir, stem)
+    try:
+        with open(state_file) as f:
+            state = json.load(f)
+        with np.load(arrays_file) as arrays:
+            counts = arrays['category_counts']
+            histograms = arrays['histograms']
+    except (OSError, ValueError, KeyError):
+        return None
+    # The arrays are replaced first, so a run interrupted in between leaves counts that don't add up
+    if state.get('version') != STATE_VERSION or int(counts.sum()) != state.get('rows'):
+        return None
+    return state, counts, histograms
+
+def save_state(output_dir, stem, state, category_counts, histograms):
+    """
+    Save the state of an incremental run.
+
+    The arrays are written before the JSON file that describes them, and
+    both through temporary names, so an interrupted run leaves either the
+    old state or the new one behind.
+    """
+    state_file, arrays_file = state_paths(output_dir, stem)
+    with open(arrays_file + '.tmp', 'wb') as f:
+        np.savez(f, category_counts=category_counts, histograms=histograms)
+    os.replace(arrays_file + '.tmp', arrays_file)
+    with open(state_file + '.tmp', 'w') as f:
+        json.dump(dict(state, version=STATE_VERSION), f, indent=2)
+    os.replace(state_file + '.tmp', state_file)
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+from confidence_engine import CATEGORIES
+
+# A sorted, filtered view of a results table for browsing in the GUI. The
+# view is an array of row positions into the DataFrame; sorting and filtering
+# only replace that array, and only the rows of the page being shown are
+# ever formatted, so tables with millions of rows stay responsive.
+
+# Rows shown per page of the Data tab
+PAGE_SIZE = 200
+
+class ResultTable:
+    """
+    Row positions of a results DataFrame in display order.
+
+    Attributes:
+        df: The DataFrame being viewed (never copied or modified)
+        columns: Its column names
+        sort_column: Column the view is sorted by, or None for file order
+        descending: Whether the sort is descending
+        categories: Category codes the view is filtered to, or None for all
+        page_size: Rows per page
+
+    Args:
+        df: Results DataFrame
+        codes: int8 category code of every row (indexes into CATEGORIES), e.g.
+            ConfidenceAnalysis.codes; used for the category filter
+        page_size: Rows per page
+    """
+
+    def __init__(self, df, codes, page_size=PAGE_SIZE):
+        self.df = df
+        self.page_size = page_size
+        self.columns = list(df.columns)
+        self.codes = np.asarray(codes)
+        self.sort_column = None
+        self.descending = False
+        self.categories = None
+        self._orders = {}
+        self._view = np.arange(len(df))
+
+    def __len__(self):
+        """Number of rows in the view."""
+        return len(self._view)
+
+    @property
+    def total(self):
+        """Number of rows in the table."""
+        return len(self.df)
+
+    def _order(self, column):
+        """Stable ascending order of the rows by `column`, missing values last; computed once per column."""
+        order = self._orders.get(column)
+        if order is None:
+            values = self.df[column].array
+            if isinstance(values, pd.Categorical):
+                # Sort the few categories by name, then the rows by the rank of their category
+                ranks = np.argsort(np.argsort(np.asarray(values.categories, dtype=object), kind='stable'))
+                key = np.where(values.codes < 0, len(ranks), ranks[values.codes])
+                order = np.argsort(key, kind='stable')
+            else:
+                order = np.asarray(values.argsort(kind='stable'))
+            self._orders[column] = order
+        return order
+
+    def _update(self):
+        order = self._order(self.sort_column) if self.sort_column is not None else np.arange(self.total)
+        if self.descending:
+            order = order[::-1]
+        if self.categories is not None:
+            order = order[np.isin(self.codes[order], self.categories)]
+        self._view = order
+
+    def sort_by(self, column, descending=None):
+        """
+        Sort the view by a column.
+
+        Args:
+            column: Column name, or None for file order
+            descending: Sort direction; by default, sorting by the current sort
+                column again reverses it and a new column sorts ascending
+        """
+        if descending is None:
+            descending = column == self.sort_column and not self.descending
+        self.sort_column = column
+        self.descending = descending
+        self._update()
+
+    def filter_categories(self, categories):
+        """
+        Show only the rows in some categories.
+
+        Args:
+            categories: Category names or codes, or None to show every row
+        """
+        if categories is not None:
+            categories = np.array([CATEGORIES.index(c) if isinstance(c, str) else c for c in categories],
+                                  dtype=self.codes.dtype)
+        self.categories = categories
+        self._update()
+
+    def positions(self, start, stop):
+        """Row positions in the DataFrame of the view rows [start, stop)."""
+        return self._view[start:stop]
+
+    def rows(self, start, stop):
+        """
+        Cell text of the view rows [start, stop).
+
+        Returns:
+            List of tuples of strings, one per row, in column order
+        """
+        page = self.df.iloc[self.positions(start, stop)]
+        cells = [page[column].astype(object).where(page[column].notna(), '').astype(str).tolist()
+                 for column in self.columns]
+        return list(zip(*cells))
+
+    def page_count(self):
+        """Number of pages of the view (at least 1)."""
+        return max(1, -(-len(self) // self.page_size))
+
+    def page(self, number):
+        """Cell text of page `number` (0-based) of the view, see rows."""
+        start = number * self.page_size
+        return self.rows(start, start + self.page_size)
@@ -3,15 +3,30 @@ from tkinter import filedialog, ttk, messagebox, scrolledtext
 import os
 import sys
 import threading
-import matplotlib.pyplot as plt
+from datetime import datetime
+from matplotlib import cm
+from matplotlib.artist import setp
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import pandas as pd
 import numpy as np
 from matplotlib.figure import Figure
-from analyze_confidence import categorize_confidence
+from confidence_plots import draw_scores
+from confidence_figures import FigureRenderer, render_distribution, render_scatter, scatter_data
+from confidence_profile import StageProfiler
+from confidence_picking import PointIndex, ScatterPicker
+from confidence_engine import CATEGORIES
+from confidence_jobs import STEP_ROWS, AnalysisJob, JobCancelled
 
-# Prevent matplotlib from using the main thread warning
-plt.switch_backend('Agg')
+# Stages of a GUI analysis, in order, and what the progress bar says during each
+ANALYSIS_STAGES = {
+    'read': "Reading the input file",
+    'validate': "Checking the scores",
+    'categorize': "Categorizing",
+    'summary': "Summarizing",
+    'write_results': "Saving the results",
+    'write_summary': "Saving the summary",
+    'render_submit': "Rendering charts",
+    'render_wait': "Rendering charts",
+}
 
 class ConfidenceAnalyzerGUI:
     def __init__(self, root):
@@ -30,8 +45,27 @@ class ConfidenceAnalyzerGUI:
         self.file_path = tk.StringVar()
         self.output_dir = tk.StringVar()
         self.calibration_threshold = tk.IntVar(value=5)
+        self.write_profile = tk.BooleanVar(value=False)
+        self.use_cache = tk.BooleanVar(value=True)
         self.results_df = None
         self.summary_df = None
+        self.category_codes = None
+        self.table = None
+        self.data_page = 0
+        self.data_filter = tk.StringVar(value="All categories")
+        self.data_position = tk.StringVar()
+        self.job = None
+        self.progress_var = tk.DoubleVar(value=0)
+        self.progress_text = tk.StringVar()
+        
+        # Version of the results on screen; a figure is redrawn only when its key changed
+        self.result_version = 0
+        self.drawn_plots = {}
+        
+        # Lookup of the user under the mouse in the scatter plot, built once per result version
+        self.point_index = None
+        self.picker = None
+        self.selection_text = tk.StringVar()
         
         # Main container
         main_frame = ttk.Frame(root, padding=10)
@@ -75,12 +109,19 @@ class ConfidenceAnalyzerGUI:
         
         ttk.Label(threshold_frame, text="Calibration Threshold (%):").pack(side=tk.LEFT, padx=5)
         ttk.Spinbox(threshold_frame, from_=1, to=20, textvariable=self.calibration_threshold, width=5).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(threshold_frame, text="Write profile report", variable=self.write_profile).pack(side=tk.LEFT, padx=20)
+        ttk.Checkbutton(threshold_frame, text="Reuse cached results", variable=self.use_cache).pack(side=tk.LEFT, padx=5)
         
         # Run button
         button_frame = ttk.Frame(input_frame)
         button_frame.pack(fill=tk.X, pady=10)
         
-        ttk.Button(button_frame, text="Run Analysis", command=self.run_analysis).pack(side=tk.RIGHT, padx=5)
+        self.run_button = ttk.Button(button_frame, text="Run Analysis", command=self.run_analysis)
+        self.run_button.pack(side=tk.RIGHT, padx=5)
+        self.cancel_button = ttk.Button(button_frame, text="Cancel", command=self.cancel_analysis, state="disabled")
+        self.cancel_button.pack(side=tk.RIGHT, padx=5)
+        ttk.Progressbar(button_frame, variable=self.progress_var, maximum=100, length=250).pack(side=tk.LEFT, padx=5)
+        ttk.Label(button_frame, textvariable=self.progress_text).pack(side=tk.LEFT, padx=5)
     
     def create_results_section(self, parent):
         results_frame = ttk.LabelFrame(parent, text="Results", padding=10)
@@ -101,13 +142,39 @@ class ConfidenceAnalyzerGUI:
         data_frame = ttk.Frame(self.notebook)
         self.notebook.add(data_frame, text="Data")
         
-        self.data_text = scrolledtext.ScrolledText(data_frame, wrap=tk.WORD, font=("Courier", 12))
-        self.data_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        # Only the rows of the current page are put into the tree; sorting and filtering work on row indexes
+        data_toolbar = ttk.Frame(data_frame)
+        data_toolbar.pack(fill=tk.X, padx=5, pady=(5, 0))
+        
+        ttk.Label(data_toolbar, text="Show:").pack(side=tk.LEFT, padx=5)
+        filter_box = ttk.Combobox(data_toolbar, textvariable=self.data_filter, state="readonly", width=34,
+                                  values=["All categories"] + list(CATEGORIES))
+        filter_box.pack(side=tk.LEFT, padx=5)
+        filter_box.bind("<<ComboboxSelected>>", self.on_data_filter)
+        
+        for text, move in ((">>", "last"), (">", 1), ("<", -1), ("<<", "first")):
+            ttk.Button(data_toolbar, text=text, width=3,
+                       command=lambda move=move: self.change_data_page(move)).pack(side=tk.RIGHT, padx=2)
+        ttk.Label(data_toolbar, textvariable=self.data_position).pack(side=tk.RIGHT, padx=10)
+        
+        tree_frame = ttk.Frame(data_frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.data_tree = ttk.Treeview(tree_frame, show="headings", selectmode="browse")
+        tree_scroll = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.data_tree.yview)
+        self.data_tree.configure(yscrollcommand=tree_scroll.set)
+        tree_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.data_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
         # Scatter Plot tab
         self.scatter_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.scatter_frame, text="Scatter Plot")
         
+        # Hover a point for the user's name; click or drag a lasso to select users
+        scatter_toolbar = ttk.Frame(self.scatter_frame)
+        scatter_toolbar.pack(fill=tk.X, padx=5, pady=(5, 0))
+        ttk.Button(scatter_toolbar, text="Export Selection", command=self.export_selection).pack(side=tk.RIGHT, padx=5)
+        ttk.Label(scatter_toolbar, textvariable=self.selection_text).pack(side=tk.RIGHT, padx=10)
+        
         # Create scatter plot canvas in advance
         self.scatter_figure = Figure(figsize=(8, 6))
         self.scatter_canvas = FigureCanvasTkAgg(self.scatter_figure, self.scatter_frame)
@@ -126,20 +193,30 @@ class ConfidenceAnalyzerGUI:
         self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_change)
     
     def on_tab_change(self, event):
+        self.draw_visible_plot()
+    
+    def draw_visible_plot(self):
         # Get the current tab
         current_tab = self.notebook.index(self.notebook.select())
         tab_name = self.notebook.tab(current_tab, "text")
         
+        # Switching back to a tab costs nothing unless the results or the threshold changed since it was drawn
         if self.results_df is not None:
             if tab_name == "Scatter Plot":
-                self.create_scatter_plot()
+                key = (self.result_version, self.calibration_threshold.get())
+                if self.drawn_plots.get('scatter') != key:
+                    self.create_scatter_plot()
+                    self.drawn_plots['scatter'] = key
             elif tab_name == "Distribution":
-                self.create_distribution_plot()
+                if self.drawn_plots.get('distribution') != self.result_version:
+                    self.create_distribution_plot()
+                    self.drawn_plots['distribution'] = self.result_version
     
     def browse_file(self):
         filename = filedialog.askopenfilename(
             title="Select CSV File",
-            filetypes=(("CSV files", "*.csv"), ("All files", "*.*"))
+            filetypes=(("CSV files", "*.csv"), ("Parquet/Feather files", "*.parquet *.feather *.arrow"),
+                       ("All files", "*.*"))
         )
         if filename:
             self.file_path.set(filename)
@@ -173,123 +250,176 @@ class ConfidenceAnalyzerGUI:
         
         # Clear previous results
         self.summary_text.delete(1.0, tk.END)
-        self.data_text.delete(1.0, tk.END)
+        self.table = None
+        self.show_data_page()
         
         # Run in a separate thread to keep UI responsive
         self.status_var.set("Running analysis...")
-        
-        # Disable run button during analysis
-        for widget in self.root.winfo_children():
-            if isinstance(widget, ttk.Button) and widget["text"] == "Run Analysis":
-                widget.state(["disabled"])
-        
-        threading.Thread(target=self.perform_analysis, args=(file_path, output_dir, threshold), daemon=True).start()
+        self.progress_var.set(0)
+        
+        # One analysis at a time; Cancel stops it at the next stage or chunk of rows
+        self.run_button.state(["disabled"])
+        self.cancel_button.state(["!disabled"])
+        
+        profile = self.write_profile.get()
+        self.job = AnalysisJob(ANALYSIS_STAGES, on_progress=self.report_progress,
+                               profiler=StageProfiler(enabled=profile))
+        threading.Thread(target=self.perform_analysis,
+                         args=(self.job, file_path, output_dir, threshold, profile, self.use_cache.get()),
+                         daemon=True).start()
+    
+    def cancel_analysis(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.cancel_button.state(["disabled"])
+            self.progress_text.set("Cancelling...")
     
-    def perform_analysis(self, file_path, output_dir, threshold):
+    def report_progress(self, fraction, stage):
+        # Called from the worker thread
+        self.root.after(0, lambda: (self.progress_var.set(fraction * 100),
+                                    self.progress_text.set(ANALYSIS_STAGES[stage])))
+    
+    def perform_analysis(self, job, file_path, output_dir, threshold, profile=False, use_cache=True):
+        profiler = job.profiler
+        # Files of this run that a Cancel removes again, until the tables are complete
+        written = []
+        shown = False
         try:
-            # Read the data directly
-            df = pd.read_csv(file_path)
-            required_columns = ['User Name', 'Quiz Score', 'Confidence Score']
+            # pandas and the readers load on first use, so the window opens without waiting for them
+            from confidence_io import REQUIRED_COLUMNS, TableWriter, read_columns
+            from confidence_analysis import ConfidenceAnalysis, analyze_frame
+            from analyze_confidence import DEFAULT_RENDER_WORKERS, Rejects, check_cache, read_scores_table, store_in_cache
             
             # Verify required columns
-            for col in required_columns:
-                if col not in df.columns:
-                    self.root.after(0, lambda: messagebox.showerror("Error", f"Missing required column '{col}' in the CSV file."))
+            columns = read_columns(file_path)
+            for col in REQUIRED_COLUMNS:
+                if col not in columns:
+                    self.root.after(0, lambda: messagebox.showerror("Error", f"Missing required column '{col}' in the input file."))
                     self.root.after(0, lambda: self.status_var.set("Analysis failed: Missing columns."))
-                    self.root.after(0, self.enable_run_button)
+                    self.root.after(0, self.finish_job)
                     return
             
+            # An identical earlier run (same file content and threshold) is copied instead of redone
+            cache, cache_key, cached = check_cache(file_path, output_dir, use_cache and not profile,
+                                                   producer='gui', calibration_threshold=threshold, plots=True,
+                                                   output_format='csv', on_invalid='reject', quiet=True)
+            if cached is not None:
+                self.results_df = cached
+                self.category_codes = cached['Confidence Category'].cat.codes.values
+                self.summary_df = ConfidenceAnalysis(self.category_codes, threshold).summary()
+                self.root.after(0, self.update_results)
+                self.root.after(0, lambda: self.status_var.set(
+                    f"Analysis complete (reused cached results). Results saved to {output_dir}"))
+                self.root.after(0, self.finish_job)
+                return
+            
+            # Read the data directly
+            with job.stage('read'):
+                df = read_scores_table(file_path)
+            
+            # Rows with missing, non-numeric or out-of-range scores are left out and saved separately
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            rejects_file = os.path.join(output_dir, f"confidence_analysis_rejects_{timestamp}.csv")
+            written.append(rejects_file)
+            with job.stage('validate'), Rejects(rejects_file, 'csv') as rejects:
+                df = rejects.check(df)
+            
             # Add confidence category column
-            df['Confidence Category'] = df.apply(lambda row: categorize_confidence(row, threshold), axis=1)
+            with job.stage('categorize'):
+                analysis = analyze_frame(df, threshold)
+                df['Confidence Category'] = analysis.labels
             
             # Calculate summary statistics
-            summary = df['Confidence Category'].value_counts().reset_index()
-            summary.columns = ['Category', 'Count']
-            summary['Percentage'] = (summary['Count'] / len(df) * 100).round(1)
+            with job.stage('summary'):
+                summary = analysis.summary()
             
             # Save files
-            timestamp = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")
             output_file = os.path.join(output_dir, f"confidence_analysis_results_{timestamp}.csv")
             summary_file = os.path.join(output_dir, f"confidence_analysis_summary_{timestamp}.csv")
+            written += [output_file, summary_file]
             
-            # Save CSV files
-            df.to_csv(output_file, index=False)
-            summary.to_csv(summary_file, index=False)
-            
-            # Save scatter plot
-            plt.figure(figsize=(10, 8))
-            categories = df['Confidence Category'].unique()
-            colors = plt.cm.tab10(np.linspace(0, 1, len(categories)))
-            
-            for i, category in enumerate(categories):
-                subset = df[df['Confidence Category'] == category]
-                plt.scatter(subset['Quiz Score'], subset['Confidence Score'], 
-                           label=category, color=colors[i], alpha=0.7)
-            
-            plt.plot([0, 100], [0, 100], 'k--', label='Perfect Calibration')
-            plt.plot([0, 100], [threshold, 100 + threshold], 'r:', label=f'+{threshold}% Threshold')
-            plt.plot([0, 100], [-threshold, 100 - threshold], 'r:', label=f'-{threshold}% Threshold')
-            
-            plt.xlabel('Quiz Score (%)')
-            plt.ylabel('Confidence Score (%)')
-            plt.title('Quiz Score vs Confidence Analysis')
-            plt.grid(True, alpha=0.3)
-            plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-            plt.tight_layout()
-            scatter_file = os.path.join(output_dir, f"confidence_scatter_plot_{timestamp}.png")
-            plt.savefig(scatter_file, dpi=300, bbox_inches='tight')
-            plt.close()
+            # Save CSV files; the results go out in steps so progress moves and Cancel needn't wait for all of them
+            with job.stage('write_results'), TableWriter(output_file, 'csv') as out:
+                for start in range(0, max(len(df), 1), STEP_ROWS):
+                    out.write(df.iloc[start:start + STEP_ROWS])
+                    job.step(min(start + STEP_ROWS, len(df)) / max(len(df), 1))
+            with job.stage('write_summary'):
+                summary.to_csv(summary_file, index=False)
+            written = []
             
-            # Save distribution plot
-            plt.figure(figsize=(10, 6))
-            sorted_summary = summary.sort_values('Count', ascending=False)
-            colors = plt.cm.tab10(np.linspace(0, 1, len(sorted_summary)))
-            bars = plt.bar(sorted_summary['Category'], sorted_summary['Count'], color=colors)
-            
-            # Add count labels on top of bars
-            for bar in bars:
-                height = bar.get_height()
-                plt.annotate(f'{height}',
-                            xy=(bar.get_x() + bar.get_width() / 2, height),
-                            xytext=(0, 3),
-                            textcoords="offset points",
-                            ha='center', va='bottom')
-            
-            plt.xlabel('Confidence Category')
-            plt.ylabel('Number of Users')
-            plt.title('Distribution of Confidence Categories')
-            plt.xticks(rotation=45, ha='right')
-            plt.tight_layout()
-            dist_file = os.path.join(output_dir, f"confidence_distribution_{timestamp}.png")
-            plt.savefig(dist_file, dpi=300, bbox_inches='tight')
-            plt.close()
-            
-            # Save results to instance variables
+            # Show the results right away; the saved charts are rendered in worker processes afterwards
             self.results_df = df
+            self.category_codes = analysis.codes
             self.summary_df = summary
-            
-            # Update UI on the main thread
             self.root.after(0, self.update_results)
-            self.root.after(0, lambda: self.status_var.set(f"Analysis complete. Results saved to {output_dir}"))
+            self.root.after(0, lambda: self.status_var.set(f"Results saved to {output_dir}. Rendering charts..."))
+            shown = True
+            
+            with job.stage('render_submit'):
+                renderer = FigureRenderer(DEFAULT_RENDER_WORKERS)
+                categories = list(summary['Category'])
+                renderer.submit(render_scatter, os.path.join(output_dir, f"confidence_scatter_plot_{timestamp}.png"),
+                                categories, threshold, dpi=300, tight=True,
+                                **scatter_data(df['Quiz Score'].values, df['Confidence Score'].values, analysis.codes))
+                renderer.submit(render_distribution, os.path.join(output_dir, f"confidence_distribution_{timestamp}.png"),
+                                categories, summary['Count'].values, annotate=True, figsize=(10, 6), dpi=300, tight=True)
             
+            failed = []
+            with job.stage('render_wait'), renderer:
+                for done, (chart_file, error) in enumerate(renderer.completed(), 1):
+                    if error is not None:
+                        failed.append(os.path.basename(chart_file))
+                    else:
+                        saved = os.path.basename(chart_file)
+                        self.root.after(0, lambda saved=saved: self.status_var.set(f"Saved {saved}"))
+                    if job.cancelled:
+                        renderer.cancel()
+                    job.step(done / 2)
+            
+            status = f"Analysis complete. Results saved to {output_dir}"
+            if rejects.count:
+                status += f" ({rejects.count} rows with invalid scores left out, see {os.path.basename(rejects_file)})"
+            if failed:
+                status += f" (could not render {', '.join(failed)})"
+            elif cache is not None:
+                store_in_cache(cache, cache_key, output_file, summary_file, output_dir, timestamp, plots=True,
+                               rejects_file=rejects_file)
+            report_file = profiler.write(output_dir, timestamp, input_file=file_path, rows=len(df),
+                                         calibration_threshold=threshold, mode='gui')
+            if report_file:
+                status += f" (profile: {os.path.basename(report_file)})"
+            self.root.after(0, lambda: self.status_var.set(status))
+            
+        except JobCancelled:
+            for path in written:
+                if os.path.exists(path):
+                    os.remove(path)
+            if shown:
+                status = f"Analysis cancelled while rendering the charts. Results saved to {output_dir}"
+            else:
+                status = "Analysis cancelled."
+            self.root.after(0, lambda: self.status_var.set(status))
         except Exception as e:
             self.root.after(0, lambda: messagebox.showerror("Error", f"Analysis failed: {str(e)}"))
             self.root.after(0, lambda: self.status_var.set("Analysis failed."))
         
         # Re-enable run button
-        self.root.after(0, self.enable_run_button)
+        self.root.after(0, self.finish_job)
     
-    def enable_run_button(self):
-        for widget in self.root.winfo_children():
-            if isinstance(widget, ttk.Button) and widget["text"] == "Run Analysis":
-                widget.state(["!disabled"])
+    def finish_job(self):
+        self.job = None
+        self.run_button.state(["!disabled"])
+        self.cancel_button.state(["disabled"])
+        self.progress_var.set(0)
+        self.progress_text.set("")
     
     def update_results(self):
         # Update summary tab
         self.summary_text.delete(1.0, tk.END)
         self.summary_text.insert(tk.END, "Summary of Confidence Categories:\n\n")
         
-        max_cat_len = max(len(cat) for cat in self.summary_df['Category']) + 2
+        # The summary is empty when every row was rejected
+        max_cat_len = max((len(cat) for cat in self.summary_df['Category']), default=len('Category')) + 2
         self.summary_text.insert(tk.END, f"{'Category':{max_cat_len}}  {'Count':8}  {'Percentage':10}\n")
         self.summary_text.insert(tk.END, f"{'-'*max_cat_len}  {'-'*8}  {'-'*10}\n")
         
@@ -297,60 +427,84 @@ class ConfidenceAnalyzerGUI:
             self.summary_text.insert(tk.END, f"{row['Category']:{max_cat_len}}  {row['Count']:8}  {row['Percentage']:10.1f}%\n")
         
         # Update data tab
-        self.data_text.delete(1.0, tk.END)
-        
-        # Show first 100 rows with formatting
-        display_df = self.results_df.head(100)
-        headers = display_df.columns.tolist()
-        
-        # Calculate column widths
-        col_widths = {}
-        for col in headers:
-            col_widths[col] = max(len(col), display_df[col].astype(str).str.len().max()) + 2
-        
-        # Create header
-        header_line = ""
-        for col in headers:
-            header_line += f"{col:{col_widths[col]}}"
-        self.data_text.insert(tk.END, header_line + "\n")
-        
-        # Add separator
-        separator = ""
-        for col in headers:
-            separator += f"{'-' * col_widths[col]}"
-        self.data_text.insert(tk.END, separator + "\n")
-        
-        # Add data rows
-        for _, row in display_df.iterrows():
-            line = ""
-            for col in headers:
-                line += f"{str(row[col]):{col_widths[col]}}"
-            self.data_text.insert(tk.END, line + "\n")
-        
-        if len(self.results_df) > 100:
-            self.data_text.insert(tk.END, f"\nShowing 100 of {len(self.results_df)} rows.")
-        
-        # Create initial plots
-        self.create_scatter_plot()
-        self.create_distribution_plot()
+        from confidence_table import ResultTable
+        self.table = ResultTable(self.results_df, self.category_codes)
+        self.data_tree["columns"] = self.table.columns
+        for col in self.table.columns:
+            self.data_tree.heading(col, text=col, command=lambda col=col: self.on_data_sort(col))
+            self.data_tree.column(col, width=220 if col == 'Confidence Category' else 120, stretch=True)
+        self.data_filter.set("All categories")
+        self.data_page = 0
+        self.show_data_page()
+        
+        # New results: draw the plot on screen now and the other one when its tab is opened
+        self.result_version += 1
+        self.draw_visible_plot()
+    
+    def show_data_page(self):
+        self.data_tree.delete(*self.data_tree.get_children())
+        if self.table is None:
+            self.data_position.set("")
+            return
+        
+        pages = self.table.page_count()
+        self.data_page = min(max(self.data_page, 0), pages - 1)
+        for values in self.table.page(self.data_page):
+            self.data_tree.insert("", tk.END, values=values)
+        
+        first = self.data_page * self.table.page_size
+        shown = len(self.table)
+        position = f"Rows {min(first + 1, shown):,}-{min(first + self.table.page_size, shown):,} of {shown:,}"
+        if shown != self.table.total:
+            position += f" (filtered from {self.table.total:,})"
+        self.data_position.set(position + f"  Page {self.data_page + 1:,}/{pages:,}")
+    
+    def change_data_page(self, move):
+        if self.table is None:
+            return
+        if move == "first":
+            self.data_page = 0
+        elif move == "last":
+            self.data_page = self.table.page_count() - 1
+        else:
+            self.data_page += move
+        self.show_data_page()
+    
+    def on_data_sort(self, column):
+        if self.table is None:
+            return
+        self.table.sort_by(column)
+        for col in self.table.columns:
+            arrow = (" \u25bc" if self.table.descending else " \u25b2") if col == column else ""
+            self.data_tree.heading(col, text=col + arrow)
+        self.data_page = 0
+        self.show_data_page()
+    
+    def on_data_filter(self, event=None):
+        if self.table is None:
+            return
+        choice = self.data_filter.get()
+        self.table.filter_categories(None if choice == "All categories" else [choice])
+        self.data_page = 0
+        self.show_data_page()
     
     def create_scatter_plot(self):
         if self.results_df is None:
             return
             
         # Clear the figure
+        if self.picker is not None:
+            self.picker.disconnect()
         self.scatter_figure.clear()
         ax = self.scatter_figure.add_subplot(111)
         
         # Get unique categories and assign colors
         categories = self.results_df['Confidence Category'].unique()
-        colors = plt.cm.tab10(range(len(categories)))
+        colors = cm.tab10(range(len(categories)))
         
-        # Plot each category
-        for i, category in enumerate(categories):
-            subset = self.results_df[self.results_df['Confidence Category'] == category]
-            ax.scatter(subset['Quiz Score'], subset['Confidence Score'], 
-                      label=category, color=colors[i], alpha=0.7)
+        # Plot each category (as a density grid for large files)
+        draw_scores(ax, self.results_df['Quiz Score'].values, self.results_df['Confidence Score'].values,
+                    self.category_codes, categories, colors)
         
         # Add reference lines
         ax.plot([0, 100], [0, 100], 'k--', label='Perfect Calibration')
@@ -365,8 +519,40 @@ class ConfidenceAnalyzerGUI:
         ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.15), ncol=2)
         
         self.scatter_figure.tight_layout()
+        
+        if self.point_index is None or self.point_index[0] != self.result_version:
+            self.point_index = (self.result_version, PointIndex(self.results_df['Quiz Score'].values,
+                                                                self.results_df['Confidence Score'].values))
+            self.selection_text.set("")
+        self.picker = ScatterPicker(ax, self.point_index[1], self.describe_point, self.on_point_selection)
         self.scatter_canvas.draw()
     
+    def describe_point(self, point, others):
+        row = self.results_df.iloc[point]
+        text = (f"{row['User Name']}\nQuiz: {row['Quiz Score']:g}  Confidence: {row['Confidence Score']:g}\n"
+                f"{row['Confidence Category']}")
+        if others:
+            text += f"\n(+{others} more here)"
+        return text
+    
+    def on_point_selection(self, selected):
+        self.selection_text.set(f"{len(selected):,} users selected" if len(selected) else "")
+    
+    def export_selection(self):
+        if self.picker is None or not len(self.picker.selected):
+            messagebox.showinfo("Export Selection", "Click a point or drag a lasso around some points first.")
+            return
+        
+        output_dir = self.output_dir.get() or os.path.dirname(self.file_path.get())
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = os.path.join(output_dir, f"confidence_selection_{timestamp}.csv")
+        try:
+            self.results_df.iloc[self.picker.selected].to_csv(output_file, index=False)
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not save the selection: {str(e)}")
+            return
+        self.status_var.set(f"{len(self.picker.selected):,} selected users saved to {output_file}")
+    
     def create_distribution_plot(self):
         if self.summary_df is None:
             return
@@ -379,7 +565,7 @@ class ConfidenceAnalyzerGUI:
         sorted_summary = self.summary_df.sort_values('Count', ascending=False)
         
         # Create bar chart with different colors
-        colors = plt.cm.tab10(np.linspace(0, 1, len(sorted_summary)))
+        colors = cm.tab10(np.linspace(0, 1, len(sorted_summary)))
         bars = ax.bar(sorted_summary['Category'], sorted_summary['Count'], color=colors)
         
         # Add count labels on top of bars
@@ -394,7 +580,7 @@ class ConfidenceAnalyzerGUI:
         ax.set_xlabel('Confidence Category')
         ax.set_ylabel('Number of Users')
         ax.set_title('Distribution of Confidence Categories')
-        plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+        setp(ax.get_xticklabels(), rotation=45, ha='right')
         
         self.bar_figure.tight_layout()
         self.bar_canvas.draw()
@@ -3,104 +3,154 @@ import matplotlib.pyplot as plt
 import numpy as np
 import os
 from matplotlib.widgets import Slider, Button
+from matplotlib.lines import Line2D
 import sys
-
-def categorize_confidence(quiz_score, confidence_score, calibration_threshold=5):
-    """
-    Categorize users based on their quiz score and confidence level.
-    """
-    diff = confidence_score - quiz_score
-    
-    if abs(diff) <= calibration_threshold:
-        if quiz_score >= 70:
-            return "Calibrated - Knows They Know"
-        else:
-            return "Calibrated - Knows They Don't Know"
-    elif diff > calibration_threshold:
-        if diff > 20:
-            return "Highly Overconfident"
-        else:
-            return "Moderately Overconfident"
-    else:  # diff < -calibration_threshold
-        if diff < -20:
-            return "Highly Underconfident"
-        else:
-            return "Moderately Underconfident"
+import argparse
+from confidence_engine import (CATEGORIES, ThresholdSweep, categorize_confidence_codes, category_histograms,
+                               grid_cell_codes)
+# categorize_confidence stays importable from here for older scripts
+from confidence_analysis import ConfidenceAnalysis, categorize_confidence  # noqa: F401
+from confidence_plots import RENDER_MODES, density_image, draw_density, use_density
+from confidence_io import REQUIRED_COLUMNS, read_columns, read_table
+from confidence_picking import PointIndex, ScatterPicker
 
 def update_plot(val):
     """Update the plot when the slider value changes."""
+    global current_codes, current_threshold
     threshold = threshold_slider.val
     
-    # Clear the current plot
-    ax.clear()
-    
-    # Recategorize data with new threshold
-    categories = []
-    for i in range(len(quiz_scores)):
-        category = categorize_confidence(quiz_scores[i], confidence_scores[i], threshold)
-        categories.append(category)
-    
-    # Create a DataFrame for easy grouping
-    df_temp = pd.DataFrame({
-        'Quiz Score': quiz_scores,
-        'Confidence Score': confidence_scores,
-        'User Name': user_names,
-        'Category': categories
-    })
-    
-    # Plot each category with different colors
-    unique_categories = df_temp['Category'].unique()
-    colors = plt.cm.tab10(np.linspace(0, 1, len(unique_categories)))
-    
-    for i, category in enumerate(unique_categories):
-        subset = df_temp[df_temp['Category'] == category]
-        ax.scatter(subset['Quiz Score'], subset['Confidence Score'], 
-                  label=category, color=colors[i], alpha=0.7)
+    # Look up the categories for the new threshold from the precomputed sweep.
+    # Only the rows whose absolute difference lies between the old and the new
+    # threshold can change category, so only their colors are rewritten.
+    # In density mode only the fixed-size grid is recolored.
+    if density_counts is not None:
+        points.set_data(density_image(density_counts, grid_cell_codes(threshold), category_colors))
+    elif threshold <= 20 and current_threshold <= 20:
+        lo, hi = sorted((sweep.boundary(current_threshold), sweep.boundary(threshold)))
+        changed = sweep.order[lo:hi]
+        current_codes[changed] = categorize_confidence_codes(
+            quiz_scores[changed], confidence_scores[changed], threshold)
+    else:
+        changed = slice(None)
+        current_codes = sweep.codes(threshold)
+    if density_counts is None:
+        point_colors[changed] = category_colors[current_codes[changed]]
+        points.set_facecolors(point_colors)
+    current_threshold = threshold
     
-    # Add the calibration lines
-    ax.plot([0, 100], [0, 100], 'k--', label='Perfect Calibration')
-    ax.plot([0, 100], [threshold, 100 + threshold], 'r:', label=f'+{threshold}% Threshold')
-    ax.plot([0, 100], [-threshold, 100 - threshold], 'r:', label=f'-{threshold}% Threshold')
-    
-    # Update plot formatting
-    ax.set_xlabel('Quiz Score (%)')
-    ax.set_ylabel('Confidence Score (%)')
-    ax.set_title(f'Quiz Score vs Confidence Analysis (Threshold: ±{threshold}%)')
-    ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    ax.grid(True, alpha=0.3)
-    ax.set_xlim(0, 100)
-    ax.set_ylim(0, 100)
+    # Move the threshold lines
+    upper_line.set_ydata([threshold, 100 + threshold])
+    lower_line.set_ydata([-threshold, 100 - threshold])
+    legend_texts[upper_line].set_text(f'+{threshold}% Threshold')
+    legend_texts[lower_line].set_text(f'-{threshold}% Threshold')
+    ax.title.set_text(f'Quiz Score vs Confidence Analysis (Threshold: ±{threshold}%)')
     
     # Update the summary statistics
-    category_counts = df_temp['Category'].value_counts()
-    total_users = len(df_temp)
+    category_counts = sweep.counts(threshold)
+    total_users = sweep.size
     summary_text = "Summary Statistics:\n"
-    for category, count in category_counts.items():
+    for code in np.argsort(-category_counts, kind='stable'):
+        count = category_counts[code]
+        if count == 0:
+            continue
         percentage = (count / total_users) * 100
-        summary_text += f"{category}: {count} ({percentage:.1f}%)\n"
+        summary_text += f"{CATEGORIES[code]}: {count} ({percentage:.1f}%)\n"
     
     text_box.set_text(summary_text)
     
     # Redraw the canvas
-    fig.canvas.draw_idle()
+    redraw()
+
+def redraw():
+    """Redraw only the changing artists when the backend can blit."""
+    global picker_background
+    if background is None:
+        fig.canvas.draw_idle()
+        return
+    
+    fig.canvas.restore_region(background)
+    for artist in animated_artists:
+        fig.draw_artist(artist)
+    fig.draw_artist(ax_threshold)
+    picker_background = fig.canvas.copy_from_bbox(fig.bbox)
+    for artist in picker.artists:
+        fig.draw_artist(artist)
+    fig.canvas.blit(fig.bbox)
+    fig.canvas.flush_events()
+
+def redraw_picker():
+    """Redraw just the tooltip and selection outline; hovering must not repaint the points."""
+    if picker_background is None:
+        redraw()
+        return
+    
+    fig.canvas.restore_region(picker_background)
+    for artist in picker.artists:
+        fig.draw_artist(artist)
+    fig.canvas.blit(fig.bbox)
+
+def on_draw(event):
+    """Cache the static background after every full draw (e.g. a resize)."""
+    global background, picker_background
+    if not points.get_animated():
+        # Full draw while saving; everything is already drawn in order
+        return
+    background = fig.canvas.copy_from_bbox(fig.bbox)
+    for artist in animated_artists:
+        fig.draw_artist(artist)
+    picker_background = fig.canvas.copy_from_bbox(fig.bbox)
+    for artist in picker.artists:
+        fig.draw_artist(artist)
+
+def set_animated(animated):
+    """Toggle blitting mode; animated artists are skipped by savefig."""
+    for artist in animated_artists + picker.artists:
+        artist.set_animated(animated)
+
+def describe_user(point, others):
+    """Tooltip text for the user under the mouse."""
+    code = categorize_confidence_codes(quiz_scores[point:point + 1], confidence_scores[point:point + 1],
+                                       threshold_slider.val)[0]
+    text = (f"{user_names[point]}\nQuiz: {quiz_scores[point]:g}  Confidence: {confidence_scores[point]:g}\n"
+            f"{CATEGORIES[code]}")
+    if others:
+        text += f"\n(+{others} more here)"
+    return text
+
+def on_select(selected):
+    """Show how many users are selected."""
+    selection_text.set_text(f"{len(selected)} users selected" if len(selected) else "")
+    redraw()
+
+def export_selection(event):
+    """Save the selected users with their categories at the current threshold."""
+    threshold = threshold_slider.val
+    selected = picker.selected
+    if not len(selected):
+        print("No users selected; click a point or draw a lasso around some first.")
+        return
+    
+    codes = categorize_confidence_codes(quiz_scores[selected], confidence_scores[selected], threshold)
+    df_selection = ConfidenceAnalysis(codes, threshold).labeled(pd.DataFrame({
+        'User Name': user_names[selected],
+        'Quiz Score': quiz_scores[selected],
+        'Confidence Score': confidence_scores[selected],
+    }))
+    
+    output_file = os.path.join(os.path.dirname(file_path), f"interactive_analysis_selection_threshold_{threshold}.csv")
+    df_selection.to_csv(output_file, index=False)
+    print(f"{len(selected)} selected users saved to {output_file}")
 
 def save_results(event):
     """Save the current analysis results."""
     threshold = threshold_slider.val
     
     # Recategorize data with current threshold
-    results = []
-    for i in range(len(quiz_scores)):
-        category = categorize_confidence(quiz_scores[i], confidence_scores[i], threshold)
-        results.append({
-            'User Name': user_names[i],
-            'Quiz Score': quiz_scores[i],
-            'Confidence Score': confidence_scores[i],
-            'Confidence Category': category
-        })
-    
-    # Create a DataFrame
-    df_results = pd.DataFrame(results)
+    df_results = ConfidenceAnalysis(sweep.codes(threshold), threshold).labeled(pd.DataFrame({
+        'User Name': user_names,
+        'Quiz Score': quiz_scores,
+        'Confidence Score': confidence_scores,
+    }))
     
     # Save the results
     output_file = os.path.join(os.path.dirname(file_path), f"interactive_analysis_results_threshold_{threshold}.csv")
@@ -108,44 +158,86 @@ def save_results(event):
     
     # Save the plot
     plot_file = os.path.join(os.path.dirname(file_path), f"interactive_analysis_plot_threshold_{threshold}.png")
+    set_animated(False)
     plt.savefig(plot_file, bbox_inches='tight')
+    set_animated(use_blit)
     
     print(f"Results saved to {output_file}")
     print(f"Plot saved to {plot_file}")
 
 if __name__ == "__main__":
     # Check command line arguments
-    if len(sys.argv) < 2:
-        print("Usage: python interactive_analysis.py <path_to_csv_file>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Interactively explore the calibration threshold.")
+    parser.add_argument("file_path", help="Path to the CSV, Parquet or Feather file containing the data")
+    parser.add_argument("--render-mode", choices=RENDER_MODES, default='auto',
+                        help="Draw one marker per user, a density grid, or pick by file size (default: auto)")
+    args = parser.parse_args()
     
-    file_path = sys.argv[1]
+    file_path = args.file_path
     
     try:
-        # Read the data
-        df = pd.read_csv(file_path)
-        
         # Check for required columns
-        required_columns = ['User Name', 'Quiz Score', 'Confidence Score']
-        for col in required_columns:
-            if col not in df.columns:
-                print(f"Error: Missing required column '{col}' in the CSV file.")
+        columns = read_columns(file_path)
+        for col in REQUIRED_COLUMNS:
+            if col not in columns:
+                print(f"Error: Missing required column '{col}' in the input file.")
                 sys.exit(1)
         
+        # Read only the columns the analysis needs
+        df = read_table(file_path, columns=REQUIRED_COLUMNS)
+        
         # Extract data
         user_names = df['User Name'].values
         quiz_scores = df['Quiz Score'].values
         confidence_scores = df['Confidence Score'].values
         
+        # Sort the score differences once so slider moves are cheap lookups
+        sweep = ThresholdSweep(quiz_scores, confidence_scores)
+        
     except Exception as e:
-        print(f"Error reading the CSV file: {e}")
+        print(f"Error reading the input file: {e}")
         sys.exit(1)
     
     # Create the interactive plot
-    plt.figure(figsize=(14, 10))
     fig, ax = plt.subplots(figsize=(14, 10))
     plt.subplots_adjust(left=0.1, bottom=0.2, right=0.75)
     
+    # One persistent scatter collection for all users; slider moves only
+    # rewrite the face colors of the points whose category changed. Large
+    # files are drawn as a density grid whose cells are recolored instead.
+    category_colors = plt.cm.tab10(np.linspace(0, 1, len(CATEGORIES)))
+    current_threshold = 5
+    current_codes = sweep.codes(current_threshold)
+    if use_density(sweep.size, args.render_mode):
+        density_counts = category_histograms(quiz_scores, confidence_scores, current_codes).sum(axis=0)
+        points = draw_density(ax, density_counts, grid_cell_codes(current_threshold), category_colors)
+    else:
+        density_counts = None
+        point_colors = category_colors[current_codes]
+        points = ax.scatter(quiz_scores, confidence_scores, facecolors=point_colors, edgecolors='face', alpha=0.7)
+    
+    # Add the calibration lines
+    perfect_line, = ax.plot([0, 100], [0, 100], 'k--', label='Perfect Calibration')
+    upper_line, = ax.plot([0, 100], [5, 105], 'r:', label='+5% Threshold')
+    lower_line, = ax.plot([0, 100], [-5, 95], 'r:', label='-5% Threshold')
+    
+    # Legend with one fixed entry per category
+    category_handles = [
+        Line2D([], [], marker='o', linestyle='', color=category_colors[code], alpha=0.7, label=category)
+        for code, category in enumerate(CATEGORIES)
+    ]
+    line_handles = ax.get_lines()
+    legend = ax.legend(handles=category_handles + line_handles, bbox_to_anchor=(1.05, 1), loc='upper left')
+    legend_texts = dict(zip(line_handles, legend.get_texts()[len(category_handles):]))
+    
+    # Plot formatting
+    ax.set_xlabel('Quiz Score (%)')
+    ax.set_ylabel('Confidence Score (%)')
+    ax.set_title('Quiz Score vs Confidence Analysis (Threshold: ±5%)')
+    ax.grid(True, alpha=0.3)
+    ax.set_xlim(0, 100)
+    ax.set_ylim(0, 100)
+    
     # Add a slider for the threshold
     ax_threshold = plt.axes([0.2, 0.05, 0.6, 0.03])
     threshold_slider = Slider(
@@ -168,6 +260,26 @@ if __name__ == "__main__":
     save_button = Button(ax_button, 'Save Results')
     save_button.on_clicked(save_results)
     
+    # Hover for a user's name, click or draw a lasso to select users, and export the selection.
+    # The grid index is built once, so lookups stay fast with millions of points.
+    ax_export = plt.axes([0.8, 0.17, 0.1, 0.05])
+    export_button = Button(ax_export, 'Export Selection')
+    export_button.on_clicked(export_selection)
+    selection_text = ax_text.text(0, 0.05, "")
+    picker = ScatterPicker(ax, PointIndex(quiz_scores, confidence_scores), describe_user, on_select, redraw_picker)
+    
+    # Use blitting where the backend supports it: the changing artists are
+    # drawn over a cached background instead of redrawing the whole figure
+    animated_artists = [points, perfect_line, upper_line, lower_line, legend, ax.title, text_box, threshold_slider.valtext,
+                        selection_text]
+    background = None
+    picker_background = None
+    use_blit = fig.canvas.supports_blit
+    if use_blit:
+        set_animated(True)
+        threshold_slider.drawon = False
+        fig.canvas.mpl_connect('draw_event', on_draw)
+    
     # Initial plot
     update_plot(5)
     